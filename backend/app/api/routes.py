@@ -1,25 +1,60 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Header
-from fastapi.responses import FileResponse
-from typing import Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Header, BackgroundTasks, Request, Path
+from fastapi.responses import RedirectResponse
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+import asyncio
+import logging
 import os
 import uuid
-import shutil
+import aiofiles
 from app.parsers.gpx_parser import GPXParser
 from app.parsers.tcx_parser import TCXParser
 from app.parsers.fit_parser import FITParser
 from app.services.video_generator import VideoGenerator
-from app.models.schemas import VideoGenerationResponse, VideoStatusResponse
+from app.models.schemas import VideoGenerationResponse, VideoStatusResponse, QueueStatusResponse
 from app.core.config import get_settings
-from app.core.supabase_client import supabase
+from app.core.supabase_client import supabase, supabase_admin
+from app.core.redis_client import redis
+from app.core.auth import cache_user, decode_token, get_cached_user
 
 router = APIRouter()
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
-# Store video generation status (in production, use a database)
-video_status = {}
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
 
+# Video IDs are uuid4().hex: 32 lowercase hex characters
+VIDEO_ID_PATTERN = r'^[0-9a-f]{32}$'
 
-async def verify_token(authorization: Optional[str] = Header(None)) -> dict:
+# Attempts (1 second apart) to record a failed video before giving up
+FAILED_STATUS_ATTEMPTS = 3
+
+
+def _has_expected_header(file_ext: str, head: bytes) -> bool:
+    """Check the first bytes of an upload against its file type"""
+    if file_ext == '.fit':
+        # FIT header: size byte (12 or 14), then ".FIT" at offset 8
+        return len(head) >= 12 and head[0] in (12, 14) and head[8:12] == b'.FIT'
+
+    root_tag = b'<gpx' if file_ext == '.gpx' else b'<TrainingCenterDatabase'
+    return head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<') and root_tag in head
+
+
+def _status_key(video_id: str) -> str:
+    return f"video:{video_id}"
+
+
+async def _set_video_status(video_id: str, **fields):
+    """Update video generation status in Redis (None is stored as an empty string)"""
+    mapping = {name: '' if value is None else value for name, value in fields.items()}
+    key = _status_key(video_id)
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, settings.video_status_ttl)
+        await pipe.execute()
+
+
+async def verify_token(request: Request, authorization: Optional[str] = Header(None)) -> dict:
     """Verify Supabase JWT token"""
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header missing")
@@ -28,23 +63,149 @@ async def verify_token(authorization: Optional[str] = Header(None)) -> dict:
         # Extract token from "Bearer <token>"
         token = authorization.split(" ")[1] if " " in authorization else authorization
 
-        # Verify token with Supabase
-        user = supabase.auth.get_user(token)
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid token")
+        user = get_cached_user(token)
+        if user:
+            return user
 
+        # Verify the signature locally; ask Supabase only if that isn't possible.
+        # Both paths yield the same {'id', 'email'} dict, which is what gets cached
+        claims = decode_token(token, request.app.state.jwks)
+        if claims:
+            user = {'id': claims.get('sub'), 'email': claims.get('email')}
+        else:
+            response = supabase.auth.get_user(token)
+            if not response or not response.user:
+                raise HTTPException(status_code=401, detail="Invalid token")
+            user = {'id': response.user.id, 'email': response.user.email}
+
+        cache_user(token, user)
         return user
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
 
 
-@router.post("/upload", response_model=VideoGenerationResponse)
+@asynccontextmanager
+async def _encode_slot(state):
+    """Hold one of the encode slots, counting running and waiting encodes"""
+    counts = state.encode_counts
+    counts['waiting'] += 1
+    try:
+        await state.encode_sem.acquire()
+    finally:
+        counts['waiting'] -= 1
+
+    counts['active'] += 1
+    try:
+        yield
+    finally:
+        counts['active'] -= 1
+        state.encode_sem.release()
+
+
+def _parse_activity_file(file_path: str, file_ext: str) -> Dict:
+    """Parse file based on type (runs in the parse worker pool)"""
+    if file_ext == '.gpx':
+        return GPXParser.parse(file_path)
+    elif file_ext == '.tcx':
+        return TCXParser.parse(file_path)
+    elif file_ext == '.fit':
+        return FITParser.parse(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+
+
+def _generate_video(activity_data: Dict, output_path: str, render_workers: int) -> str:
+    """Render the video on render_workers processes (runs in the encode worker pool)"""
+    video_generator = VideoGenerator(width=settings.video_width, height=settings.video_height, fps=settings.video_fps,
+                                     render_workers=render_workers)
+    return video_generator.create_video(activity_data, output_path)
+
+
+def _video_object_path(video_id: str) -> str:
+    return f"{video_id}.mp4"
+
+
+def _create_signed_url(video_id: str) -> str:
+    """Signed Supabase Storage URL for a generated video"""
+    bucket = supabase_admin.storage.from_(settings.video_bucket)
+    signed = bucket.create_signed_url(_video_object_path(video_id), settings.signed_url_ttl)
+    return signed['signedURL']
+
+
+def _upload_video(video_id: str, output_path: str) -> str:
+    """Upload the generated video to Supabase Storage and return a signed URL"""
+    bucket = supabase_admin.storage.from_(settings.video_bucket)
+    with open(output_path, 'rb') as f:
+        bucket.upload(_video_object_path(video_id), f, {"content-type": "video/mp4"})
+    return _create_signed_url(video_id)
+
+
+async def _mark_video_failed(video_id: str, error: str):
+    """Record a failed video, retrying briefly (Redis itself may be what failed)"""
+    for attempt in range(FAILED_STATUS_ATTEMPTS):
+        try:
+            await _set_video_status(video_id, status='failed', error=error)
+            return
+        except Exception as e:
+            status_error = e
+            if attempt + 1 < FAILED_STATUS_ATTEMPTS:
+                await asyncio.sleep(1)
+
+    # The 'processing' status left behind still expires after VIDEO_STATUS_TTL
+    logger.error("Could not record failure of video %s (%s)", video_id, error, exc_info=status_error)
+
+
+async def _process_video(request: Request, video_id: str, file_path: str, file_ext: str, output_path: str):
+    """Parse the uploaded file and generate the video off the event loop"""
+    loop = asyncio.get_running_loop()
+
+    try:
+        activity_data = await loop.run_in_executor(
+            request.app.state.parse_pool, _parse_activity_file, file_path, file_ext
+        )
+
+        await _set_video_status(video_id, progress=0.3)
+
+        async with _encode_slot(request.app.state):
+            await _set_video_status(video_id, progress=0.5)
+            await loop.run_in_executor(
+                request.app.state.encode_pool, _generate_video, activity_data, output_path,
+                request.app.state.render_workers
+            )
+
+        await _set_video_status(video_id, progress=0.9)
+
+        # Serve the video from Supabase Storage instead of through the API
+        video_url = await loop.run_in_executor(None, _upload_video, video_id, output_path)
+
+        await _set_video_status(
+            video_id,
+            status='completed',
+            progress=1.0,
+            video_url=video_url
+        )
+
+    except Exception as e:
+        await _mark_video_failed(video_id, str(e))
+
+    finally:
+        # Clean up uploaded file and local video
+        for path in (file_path, output_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@router.post("/upload", response_model=VideoGenerationResponse, status_code=202)
 async def upload_activity_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user: dict = Depends(verify_token)
 ):
     """
-    Upload GPX/TCX/FIT file and generate video
+    Upload GPX/TCX/FIT file and start video generation
+
+    Generation runs in the background; poll /videos/{video_id}/status for the result.
     """
     # Validate file type
     allowed_extensions = ['.gpx', '.tcx', '.fit']
@@ -56,108 +217,99 @@ async def upload_activity_file(
             detail=f"Invalid file type. Allowed types: {', '.join(allowed_extensions)}"
         )
 
-    # Generate unique ID for this video
-    video_id = str(uuid.uuid4())
+    # Reject oversized and mislabeled files before writing anything to disk
+    if file.size is not None and file.size > settings.max_upload_bytes:
+        raise HTTPException(status_code=413, detail="File too large")
 
-    # Create upload directory if it doesn't exist
-    upload_dir = settings.upload_dir
-    output_dir = settings.output_dir
-    os.makedirs(upload_dir, exist_ok=True)
-    os.makedirs(output_dir, exist_ok=True)
+    head = await file.read(UPLOAD_CHUNK_SIZE)
+    if not _has_expected_header(file_ext, head):
+        raise HTTPException(status_code=400, detail=f"File content does not match {file_ext} format")
+
+    # Generate unique ID for this video
+    video_id = uuid.uuid4().hex
 
-    # Save uploaded file
-    file_path = os.path.join(upload_dir, f"{video_id}{file_ext}")
+    # Save uploaded file (directories are created at startup)
+    file_path = str(request.app.state.upload_dir / f"{video_id}{file_ext}")
 
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        written = 0
+        async with aiofiles.open(file_path, "wb") as buffer:
+            chunk = head
+            while chunk:
+                written += len(chunk)
+                if written > settings.max_upload_bytes:
+                    break
+                await buffer.write(chunk)
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
     except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
 
-    # Initialize status
-    video_status[video_id] = {
-        'status': 'processing',
-        'progress': 0.0,
-        'error': None,
-        'video_url': None
-    }
-
-    # Process file and generate video
-    try:
-        # Parse file based on type
-        if file_ext == '.gpx':
-            activity_data = GPXParser.parse(file_path)
-        elif file_ext == '.tcx':
-            activity_data = TCXParser.parse(file_path)
-        elif file_ext == '.fit':
-            activity_data = FITParser.parse(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_ext}")
-
-        video_status[video_id]['progress'] = 0.3
-
-        # Generate video
-        output_path = os.path.join(output_dir, f"{video_id}.mp4")
-        video_generator = VideoGenerator()
-
-        video_status[video_id]['progress'] = 0.5
-
-        video_generator.create_video(activity_data, output_path)
-
-        video_status[video_id]['status'] = 'completed'
-        video_status[video_id]['progress'] = 1.0
-        video_status[video_id]['video_url'] = f"/api/videos/{video_id}"
-
-        # Clean up uploaded file
+    # The size may be unknown up front; enforce the limit on what was actually sent
+    if written > settings.max_upload_bytes:
         os.remove(file_path)
+        raise HTTPException(status_code=413, detail="File too large")
 
-        return VideoGenerationResponse(
-            video_id=video_id,
-            status='completed',
-            message='Video generated successfully',
-            video_url=f"/api/videos/{video_id}"
-        )
-
-    except Exception as e:
-        video_status[video_id]['status'] = 'failed'
-        video_status[video_id]['error'] = str(e)
+    # Initialize status
+    await _set_video_status(
+        video_id,
+        status='processing',
+        progress=0.0,
+        error=None,
+        video_url=None
+    )
 
-        # Clean up files
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    output_path = str(request.app.state.output_dir / f"{video_id}.mp4")
+    background_tasks.add_task(_process_video, request, video_id, file_path, file_ext, output_path)
 
-        raise HTTPException(status_code=500, detail=f"Failed to generate video: {str(e)}")
+    return VideoGenerationResponse(
+        video_id=video_id,
+        status='processing',
+        message='Video generation started'
+    )
 
 
 @router.get("/videos/{video_id}/status", response_model=VideoStatusResponse)
-async def get_video_status(video_id: str, user: dict = Depends(verify_token)):
+async def get_video_status(video_id: str = Path(..., pattern=VIDEO_ID_PATTERN), user: dict = Depends(verify_token)):
     """Get video generation status"""
-    if video_id not in video_status:
-        raise HTTPException(status_code=404, detail="Video not found")
+    status = await redis.hgetall(_status_key(video_id))
 
-    status = video_status[video_id]
+    if not status:
+        raise HTTPException(status_code=404, detail="Video not found")
 
     return VideoStatusResponse(
         video_id=video_id,
         status=status['status'],
-        progress=status['progress'],
-        video_url=status['video_url'],
-        error=status['error']
+        progress=float(status['progress']),
+        video_url=status['video_url'] or None,
+        error=status['error'] or None
     )
 
 
 @router.get("/videos/{video_id}")
-async def download_video(video_id: str, user: dict = Depends(verify_token)):
-    """Download generated video"""
-    video_path = os.path.join(settings.output_dir, f"{video_id}.mp4")
+async def download_video(video_id: str = Path(..., pattern=VIDEO_ID_PATTERN), user: dict = Depends(verify_token)):
+    """Redirect to a signed Supabase Storage URL for the generated video"""
+    loop = asyncio.get_running_loop()
 
-    if not os.path.exists(video_path):
+    try:
+        video_url = await loop.run_in_executor(None, _create_signed_url, video_id)
+    except Exception:
         raise HTTPException(status_code=404, detail="Video not found")
 
-    return FileResponse(
-        video_path,
-        media_type="video/mp4",
-        filename=f"activity_{video_id}.mp4"
+    return RedirectResponse(video_url, status_code=302)
+
+
+@router.get("/queue", response_model=QueueStatusResponse)
+async def get_queue_status(request: Request, user: dict = Depends(verify_token)):
+    """Encode slot usage, for sizing MAX_CONCURRENT_ENCODES"""
+    max_encodes = request.app.state.max_concurrent_encodes
+    counts = request.app.state.encode_counts
+
+    return QueueStatusResponse(
+        max_concurrent_encodes=max_encodes,
+        available_slots=max_encodes - counts['active'],
+        waiting=counts['waiting']
     )
 
 
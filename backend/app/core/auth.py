@@ -0,0 +1,81 @@
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+import jwt
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+TOKEN_CACHE_TTL = 60  # seconds
+TOKEN_CACHE_SIZE = 1024
+
+# Algorithms accepted for JWKS-verified tokens
+JWKS_ALGORITHMS = ['RS256', 'ES256']
+
+# token -> (user, expires_at)
+_token_cache: Dict[str, Tuple[Dict, float]] = {}
+
+
+async def fetch_jwks() -> Optional[jwt.PyJWKSet]:
+    """Fetch the Supabase JWKS used to verify asymmetrically signed tokens"""
+    url = f"{settings.supabase_url}/auth/v1/.well-known/jwks.json"
+    try:
+        async with httpx.AsyncClient(timeout=5) as client:
+            response = await client.get(url)
+            response.raise_for_status()
+            return jwt.PyJWKSet.from_dict(response.json())
+    except Exception:
+        return None
+
+
+def decode_token(token: str, jwks: Optional[jwt.PyJWKSet]) -> Optional[dict]:
+    """Verify a Supabase access token locally
+
+    Returns the claims, or None when the token can't be verified without
+    calling Supabase (no matching key, bad signature, expired, ...).
+    """
+    try:
+        header = jwt.get_unverified_header(token)
+        if header.get('alg') == 'HS256':
+            if not settings.supabase_jwt_secret:
+                return None
+            key, algorithms = settings.supabase_jwt_secret, ['HS256']
+        else:
+            if jwks is None:
+                return None
+            key, algorithms = jwks[header['kid']].key, JWKS_ALGORITHMS
+
+        return jwt.decode(token, key, algorithms=algorithms, audience='authenticated')
+    except (jwt.PyJWTError, KeyError):
+        return None
+
+
+def get_cached_user(token: str) -> Optional[Dict]:
+    """Return the user verified for this token, if still cached"""
+    cached = _token_cache.get(token)
+    if cached is None:
+        return None
+
+    user, expires_at = cached
+    if time.time() >= expires_at:
+        _token_cache.pop(token, None)
+        return None
+    return user
+
+
+def cache_user(token: str, user: Dict):
+    """Cache a verified user for min(token expiry, TOKEN_CACHE_TTL)"""
+    expires_at = time.time() + TOKEN_CACHE_TTL
+    try:
+        exp = jwt.decode(token, options={'verify_signature': False}).get('exp')
+        if exp:
+            expires_at = min(expires_at, exp)
+    except jwt.PyJWTError:
+        pass
+
+    if len(_token_cache) >= TOKEN_CACHE_SIZE:
+        # Evict the oldest entry
+        _token_cache.pop(next(iter(_token_cache)))
+    _token_cache[token] = (user, expires_at)
@@ -1,13 +1,24 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
     supabase_url: str
     supabase_key: str
     supabase_service_key: str
+    supabase_jwt_secret: Optional[str] = None  # enables local verification of HS256 tokens
     upload_dir: str = "uploads"
+    max_upload_bytes: int = 100 * 1024 * 1024  # 100 MiB
     output_dir: str = "outputs"
+    redis_url: str = "redis://localhost:6379/0"
+    video_status_ttl: int = 3600  # seconds
+    max_concurrent_encodes: int = 0  # 0 = auto (CPU count, capped at 4)
+    video_width: int = 1920
+    video_height: int = 1080
+    video_fps: int = 30
+    video_bucket: str = "videos"  # Supabase Storage bucket for generated videos
+    signed_url_ttl: int = 3600  # seconds
 
     class Config:
         env_file = ".env"
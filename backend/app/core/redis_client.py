@@ -0,0 +1,6 @@
+from redis.asyncio import Redis
+from app.core.config import get_settings
+
+settings = get_settings()
+
+redis: Redis = Redis.from_url(settings.redis_url, decode_responses=True)
@@ -1,7 +1,14 @@
 from fastapi import FastAPI
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import asyncio
+import multiprocessing
+import os
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
 from app.core.config import get_settings
+from app.core.redis_client import redis
+from app.core.auth import fetch_jwks
 
 settings = get_settings()
 
@@ -20,6 +27,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    # Create working directories once instead of on every upload
+    app.state.upload_dir = Path(settings.upload_dir)
+    app.state.output_dir = Path(settings.output_dir)
+    app.state.upload_dir.mkdir(parents=True, exist_ok=True)
+    app.state.output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Keys for verifying access tokens locally (None falls back to Supabase)
+    app.state.jwks = await fetch_jwks()
+
+    # Parsing and encoding are CPU-bound; keep them off the event loop
+    cpu_count = os.cpu_count() or 1
+    max_encodes = settings.max_concurrent_encodes or min(4, cpu_count)
+    # Spawn rather than fork: the workers start lazily, from a process already running
+    # the event loop's threads (the renderer's frame pool spawns for the same reason)
+    mp_context = multiprocessing.get_context('spawn')
+    app.state.parse_pool = ProcessPoolExecutor(max_workers=cpu_count, mp_context=mp_context)
+    app.state.encode_pool = ProcessPoolExecutor(max_workers=max_encodes, mp_context=mp_context)
+    # Bound in-flight encodes so queued jobs wait here instead of piling up in the pool
+    app.state.max_concurrent_encodes = max_encodes
+    app.state.encode_sem = asyncio.Semaphore(max_encodes)
+    # Encodes holding a slot and encodes waiting for one (reported by /queue)
+    app.state.encode_counts = {'active': 0, 'waiting': 0}
+    # Each encode renders its frames on its share of the CPUs, so concurrent encodes don't oversubscribe them
+    app.state.render_workers = max(1, cpu_count // max_encodes)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.parse_pool.shutdown(cancel_futures=True)
+    app.state.encode_pool.shutdown(cancel_futures=True)
+    await redis.aclose()
+
+
 # Include routers
 app.include_router(router, prefix="/api", tags=["videos"])
 
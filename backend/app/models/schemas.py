@@ -15,3 +15,9 @@ class VideoStatusResponse(BaseModel):
     progress: Optional[float] = None
     video_url: Optional[str] = None
     error: Optional[str] = None
+
+
+class QueueStatusResponse(BaseModel):
+    max_concurrent_encodes: int
+    available_slots: int
+    waiting: int
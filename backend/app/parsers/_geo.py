@@ -0,0 +1,45 @@
+import numpy as np
+
+EARTH_RADIUS_M = 6371000  # Radius of earth in meters
+
+# Segments up to this length (in radians of arc, ~10 km) use the equirectangular
+# approximation; at GPS sampling intervals its error is far below GPS accuracy
+EQUIRECT_MAX_ANGLE = 10000 / EARTH_RADIUS_M
+
+
+def haversine_distances(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Distance in meters between consecutive points (length n-1)
+
+    Missing coordinates (NaN) yield NaN for the segments touching them.
+    """
+    lat_r = np.radians(lat)
+    lon_r = np.radians(lon)
+    dlat = np.diff(lat_r)
+    dlon = np.diff(lon_r)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat_r[:-1]) * np.cos(lat_r[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def segment_distances(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Distance in meters between consecutive points (length n-1)
+
+    Uses the equirectangular approximation, falling back to Haversine when any
+    segment is longer than EQUIRECT_MAX_ANGLE. Missing coordinates yield NaN.
+    """
+    lat_r = np.radians(lat)
+    lon_r = np.radians(lon)
+    dlat = np.diff(lat_r)
+    dlon = np.diff(lon_r)
+    with np.errstate(invalid='ignore'):
+        if (np.abs(dlat) > EQUIRECT_MAX_ANGLE).any() or (np.abs(dlon) > EQUIRECT_MAX_ANGLE).any():
+            return haversine_distances(lat, lon)
+    cos_lat = np.cos((lat_r[:-1] + lat_r[1:]) * 0.5)
+    return EARTH_RADIUS_M * np.hypot(dlat, dlon * cos_lat)
+
+
+def segment_speeds(distances: np.ndarray, elapsed: np.ndarray) -> np.ndarray:
+    """Speed in km/h for each segment; 0 where no time has elapsed"""
+    dt = np.diff(elapsed)
+    speeds = np.zeros_like(distances)
+    np.divide(distances, dt, out=speeds, where=dt > 0)
+    return speeds * 3.6
@@ -0,0 +1,87 @@
+import numpy as np
+from typing import Tuple
+
+from app.parsers._geo import EARTH_RADIUS_M, EQUIRECT_MAX_ANGLE, segment_distances, segment_speeds
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+
+def _track_kernel(lat, lon, elev, elapsed):
+    """Fused pass over the track: segment distances/speeds and elevation gain/loss"""
+    n = lat.shape[0]
+    distances = np.zeros(max(n - 1, 0))
+    speeds = np.zeros(max(n - 1, 0))
+    gain = 0.0
+    loss = 0.0
+
+    for i in prange(1, n):
+        lat1 = np.radians(lat[i - 1])
+        lat2 = np.radians(lat[i])
+        dlat = lat2 - lat1
+        dlon = np.radians(lon[i]) - np.radians(lon[i - 1])
+        if abs(dlat) > EQUIRECT_MAX_ANGLE or abs(dlon) > EQUIRECT_MAX_ANGLE:
+            # Long segment: full Haversine
+            a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+            distance = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+        else:
+            # Short segment: equirectangular approximation
+            x = dlon * np.cos((lat1 + lat2) * 0.5)
+            distance = EARTH_RADIUS_M * np.sqrt(dlat * dlat + x * x)
+
+        # Segments touching a missing position count as 0
+        if np.isnan(distance):
+            distance = 0.0
+        distances[i - 1] = distance
+
+        dt = elapsed[i] - elapsed[i - 1]
+        if dt > 0:
+            speeds[i - 1] = distance / dt * 3.6
+
+        # NaN elevation differences compare False and drop out
+        de = elev[i] - elev[i - 1]
+        if de > 0:
+            gain += de
+        elif de < 0:
+            loss += -de
+
+    return distances, speeds, gain, loss
+
+
+def _track_numpy(lat, lon, elev, elapsed):
+    """NumPy equivalent of _track_kernel, used when numba is not installed"""
+    distances = np.nan_to_num(segment_distances(lat, lon), nan=0.0)
+    speeds = segment_speeds(distances, elapsed)
+    diff = np.diff(elev)
+    return distances, speeds, float(diff[diff > 0].sum()), abs(float(diff[diff < 0].sum()))
+
+
+if njit is not None:
+    # No 'nnan' in fastmath: the kernel relies on NaN checks for missing values
+    _track_kernel = njit(
+        parallel=True,
+        fastmath={'reassoc', 'contract', 'arcp', 'afn'},
+        cache=True,
+    )(_track_kernel)
+    _track_impl = _track_kernel
+else:
+    _track_impl = _track_numpy
+
+
+def track_stats(
+    lat: np.ndarray, lon: np.ndarray, elev: np.ndarray, elapsed: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, float, float]:
+    """Segment distances (m) and speeds (km/h), plus total elevation gain and loss
+
+    Distances and speeds have length n-1. Uses the numba kernel when available.
+    """
+    distances, speeds, gain, loss = _track_impl(
+        np.ascontiguousarray(lat, dtype=np.float64),
+        np.ascontiguousarray(lon, dtype=np.float64),
+        np.ascontiguousarray(elev, dtype=np.float64),
+        np.ascontiguousarray(elapsed, dtype=np.float64),
+    )
+    return distances, speeds, float(gain), float(loss)
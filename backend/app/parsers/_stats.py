@@ -0,0 +1,49 @@
+import numpy as np
+from typing import Dict
+
+from app.parsers.columns import PointColumns
+
+ASSUMED_SPEED_MS = 15 / 3.6  # 15 km/h in m/s, used when the file has no times
+
+
+def set_duration(columns: PointColumns, activity_data: Dict):
+    """Set total_duration from the last elapsed_time, or estimate it
+
+    Without time data the duration is estimated from the distance at an assumed
+    average speed of 15 km/h (or 1 second per point without distance), and
+    elapsed_time is rewritten to match.
+    """
+    num_points = len(columns)
+    if not num_points:
+        return
+
+    # If we have time data, use it
+    if columns.elapsed_time[-1] > 0:
+        activity_data['total_duration'] = float(columns.elapsed_time[-1])
+        activity_data['has_time_data'] = True
+    elif activity_data['total_distance'] > 0:
+        estimated_duration = activity_data['total_distance'] / ASSUMED_SPEED_MS
+        activity_data['total_duration'] = estimated_duration
+
+        # Recalculate elapsed_time for each point based on distance proportion
+        cumulative_distance = np.cumsum(columns.distance)
+        columns.elapsed_time[:] = cumulative_distance / activity_data['total_distance'] * estimated_duration
+    else:
+        # Fallback: 1 second per point
+        activity_data['total_duration'] = num_points
+        columns.elapsed_time[:] = np.arange(num_points)
+
+
+def finalize_stats(columns: PointColumns, activity_data: Dict, elevation_gain: float, elevation_loss: float):
+    """Fill elevation statistics (gain/loss come from track_stats)"""
+    elevation = columns.elevation
+    if not elevation.size:
+        return
+
+    # fmax/fmin skip NaNs and are NaN only when every elevation is missing
+    max_elevation = np.fmax.reduce(elevation)
+    if not np.isnan(max_elevation):
+        activity_data['max_elevation'] = float(max_elevation)
+        activity_data['min_elevation'] = float(np.fmin.reduce(elevation))
+        activity_data['total_elevation_gain'] = elevation_gain
+        activity_data['total_elevation_loss'] = elevation_loss
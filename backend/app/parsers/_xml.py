@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+from lxml import etree
+
+
+def iter_elements(file_path: str, tags: Tuple[str, ...]) -> Iterator[etree._Element]:
+    """Stream matching elements, freeing each one once the caller is done with it
+
+    Only the current element is kept in memory, so large files are never
+    materialized as a full tree.
+    """
+    for _, element in etree.iterparse(file_path, events=('end',), tag=tags, huge_tree=True):
+        yield element
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+def localname(element: etree._Element) -> str:
+    """Tag name without namespace"""
+    return etree.QName(element).localname
+
+
+def parse_time(text: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO 8601 timestamp such as 2025-11-17T06:00:00Z"""
+    if not text:
+        return None
+    return datetime.fromisoformat(text.strip().replace('Z', '+00:00'))
@@ -0,0 +1,121 @@
+"""Column storage for parsed trackpoints
+
+Parsers fill the columns in float64 and compute every statistic at that
+precision, then call PointColumns.quantize() to shrink the payload handed to
+the video renderer:
+
+- latitude/longitude: kept in float64 (float32 would round positions to about 1 m)
+- elevation, elapsed_time, speed, distance: float32 (7 significant digits)
+- heart_rate, cadence: uint8; power: uint16 (the dtype maximum marks a missing value)
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+NAT = np.datetime64('NaT', 'ns')
+
+
+def to_datetime64(times: Iterable[Optional[datetime]]) -> np.ndarray:
+    """Convert datetimes (None when missing) to a naive UTC datetime64[ns] array"""
+    return np.array(
+        [t.astimezone(timezone.utc).replace(tzinfo=None) if t is not None and t.tzinfo else t for t in times],
+        dtype='datetime64[ns]',
+    )
+
+
+@dataclass
+class PointColumns:
+    """Trackpoints stored as parallel arrays, one entry per point
+
+    Optional float values (position, elevation, sensors) are NaN when missing.
+    Times are kept as UTC datetime64[ns] and only formatted as ISO strings in point().
+    """
+    latitude: np.ndarray
+    longitude: np.ndarray
+    elevation: np.ndarray
+    time: np.ndarray        # datetime64[ns] UTC, NaT when missing
+    elapsed_time: np.ndarray
+    speed: np.ndarray       # km/h
+    distance: np.ndarray    # meters from the previous point
+    heart_rate: np.ndarray
+    cadence: np.ndarray
+    power: np.ndarray
+
+    INTEGER_FIELDS = ('heart_rate', 'cadence', 'power')
+
+    # Storage types after quantize(); for integers the dtype maximum means missing
+    QUANTIZED_DTYPES = {
+        'elevation': np.float32,
+        'elapsed_time': np.float32,
+        'speed': np.float32,
+        'distance': np.float32,
+        'heart_rate': np.uint8,
+        'cadence': np.uint8,
+        'power': np.uint16,
+    }
+
+    @classmethod
+    def empty(cls, num_points: int) -> 'PointColumns':
+        """Preallocate columns for num_points points"""
+        return cls(
+            latitude=np.full(num_points, np.nan, dtype=np.float64),
+            longitude=np.full(num_points, np.nan, dtype=np.float64),
+            elevation=np.full(num_points, np.nan, dtype=np.float64),
+            time=np.full(num_points, NAT),
+            elapsed_time=np.zeros(num_points, dtype=np.float64),
+            speed=np.zeros(num_points, dtype=np.float64),
+            distance=np.zeros(num_points, dtype=np.float64),
+            heart_rate=np.full(num_points, np.nan, dtype=np.float32),
+            cadence=np.full(num_points, np.nan, dtype=np.float32),
+            power=np.full(num_points, np.nan, dtype=np.float32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.elapsed_time)
+
+    def set_times(self, times: Iterable[Optional[datetime]], start_time: Optional[datetime]):
+        """Store point times and derive elapsed_time (seconds since start_time)
+
+        Points without a time, or every point when start_time is None, keep an
+        elapsed_time of 0.
+        """
+        self.time[:] = to_datetime64(times)
+        if start_time is not None:
+            start = to_datetime64([start_time])[0]
+            self.elapsed_time[:] = np.nan_to_num((self.time - start) / np.timedelta64(1, 's'))
+
+    def quantize(self):
+        """Downcast columns to QUANTIZED_DTYPES once all statistics are computed"""
+        for name, dtype in self.QUANTIZED_DTYPES.items():
+            values = getattr(self, name)
+            if np.issubdtype(dtype, np.integer):
+                missing = np.iinfo(dtype).max
+                values = np.where(np.isnan(values), missing, np.clip(np.rint(values), 0, missing - 1))
+            setattr(self, name, values.astype(dtype))
+
+    def has_values(self, name: str) -> bool:
+        """Whether any point has a present, non-zero value in a column"""
+        values = getattr(self, name)
+        if np.issubdtype(values.dtype, np.integer):
+            present = values != np.iinfo(values.dtype).max
+        else:
+            present = ~np.isnan(values)
+        return bool(np.any(present & (values != 0)))
+
+    def point(self, index: int) -> Dict:
+        """Return a single point as a dict (missing values are None)"""
+        point = {}
+        for name in self.__dataclass_fields__:
+            value = getattr(self, name)[index]
+            if isinstance(value, np.datetime64):
+                value = None if np.isnat(value) else str(np.datetime_as_string(value, unit='auto', timezone='UTC'))
+            elif isinstance(value, np.floating):
+                value = None if np.isnan(value) else float(value)
+                if value is not None and name in self.INTEGER_FIELDS:
+                    value = int(value)
+            elif isinstance(value, np.integer):
+                value = None if value == np.iinfo(value.dtype).max else int(value)
+            point[name] = value
+        return point
@@ -1,16 +1,88 @@
+import logging
+
 from fitparse import FitFile
-from typing import Dict
+import numpy as np
+from typing import Dict, Iterator
 from datetime import datetime
 
+from app.parsers._kernels import track_stats
+from app.parsers._stats import finalize_stats, set_duration
+from app.parsers.columns import PointColumns
+
+try:
+    import fitdecode
+except ImportError:
+    fitdecode = None
+
+logger = logging.getLogger(__name__)
+
+SEMICIRCLES_TO_DEGREES = 180 / 2**31
+
+# Record fields read from the FIT file
+FIT_RECORD_FIELDS = (
+    'position_lat',
+    'position_long',
+    'altitude',
+    'timestamp',
+    'speed',
+    'heart_rate',
+    'cadence',
+    'power',
+)
+
+
+def _read_records_fitdecode(file_path: str) -> Iterator[Dict]:
+    """Yield 'record' messages as {field name: value} using fitdecode"""
+    with fitdecode.FitReader(file_path) as fit:
+        for frame in fit:
+            if frame.frame_type == fitdecode.FIT_FRAME_DATA and frame.name == 'record':
+                yield {field.name: field.value for field in frame.fields}
+
+
+def _read_records_fitparse(file_path: str) -> Iterator[Dict]:
+    """Yield 'record' messages as {field name: value} using fitparse"""
+    for record in FitFile(file_path).get_messages('record'):
+        yield record.get_values()
+
+
+def _collect_columns(records: Iterator[Dict]) -> Dict[str, np.ndarray]:
+    """Gather record values into one array per field (missing numbers are NaN)"""
+    values = {name: [] for name in FIT_RECORD_FIELDS}
+    for record in records:
+        for name, column in values.items():
+            column.append(record.get(name))
+
+    columns = {
+        name: np.array(column, dtype=np.float64)
+        for name, column in values.items()
+        if name != 'timestamp'
+    }
+    columns['timestamp'] = np.array(values['timestamp'], dtype=object)
+    return columns
+
+
+def _decode_fit_columns(file_path: str) -> Dict[str, np.ndarray]:
+    """Decode 'record' messages into per-field arrays
+
+    fitdecode is used when installed; fitparse is the fallback for files
+    fitdecode rejects (FitError covers its header, CRC, EOF and parse errors).
+    """
+    if fitdecode is not None:
+        try:
+            return _collect_columns(_read_records_fitdecode(file_path))
+        except fitdecode.FitError as e:
+            logger.warning("fitdecode could not read %s (%s), falling back to fitparse", file_path, e)
+    return _collect_columns(_read_records_fitparse(file_path))
+
 
 class FITParser:
     @staticmethod
     def parse(file_path: str) -> Dict:
         """Parse FIT file and extract activity data"""
-        fitfile = FitFile(file_path)
+        raw = _decode_fit_columns(file_path)
 
         activity_data = {
-            'points': [],
+            'points': None,
             'total_duration': 0,
             'total_distance': 0,
             'max_speed': 0,
@@ -22,127 +94,53 @@ class FITParser:
             'has_time_data': False,
         }
 
-        all_points = []
-        start_time = None
-
-        # Parse records
-        for record in fitfile.get_messages('record'):
-            point_data = {
-                'latitude': None,
-                'longitude': None,
-                'elevation': None,
-                'time': None,
-                'elapsed_time': 0,
-                'speed': 0,
-                'distance': 0,
-                'heart_rate': None,
-                'cadence': None,
-                'power': None,
-            }
-
-            for data in record:
-                if data.name == 'position_lat':
-                    # Convert semicircles to degrees
-                    point_data['latitude'] = data.value * (180 / 2**31) if data.value else None
-                elif data.name == 'position_long':
-                    point_data['longitude'] = data.value * (180 / 2**31) if data.value else None
-                elif data.name == 'altitude':
-                    point_data['elevation'] = data.value
-                elif data.name == 'timestamp':
-                    point_data['time'] = data.value.isoformat() if data.value else None
-                    if start_time is None:
-                        start_time = data.value
-                    if data.value and start_time:
-                        point_data['elapsed_time'] = (data.value - start_time).total_seconds()
-                elif data.name == 'speed':
-                    # Speed is in m/s, convert to km/h
-                    point_data['speed'] = data.value * 3.6 if data.value else 0
-                elif data.name == 'distance':
-                    point_data['distance'] = data.value if data.value else 0
-                elif data.name == 'heart_rate':
-                    point_data['heart_rate'] = data.value
-                elif data.name == 'cadence':
-                    point_data['cadence'] = data.value
-                elif data.name == 'power':
-                    point_data['power'] = data.value
-
-            if point_data['latitude'] and point_data['longitude']:
-                all_points.append(point_data)
-
-        activity_data['points'] = all_points
+        # Convert semicircles to degrees (0 means no position fix)
+        latitude = raw['position_lat'] * SEMICIRCLES_TO_DEGREES
+        longitude = raw['position_long'] * SEMICIRCLES_TO_DEGREES
+        has_position = np.nan_to_num(latitude) != 0
+        has_position &= np.nan_to_num(longitude) != 0
+
+        timestamps = raw['timestamp']
+        start_time = next((t for t in timestamps if t is not None), None)
+
+        num_points = int(has_position.sum())
+        columns = PointColumns.empty(num_points)
+        columns.latitude[:] = latitude[has_position]
+        columns.longitude[:] = longitude[has_position]
+        columns.elevation[:] = raw['altitude'][has_position]
+        columns.heart_rate[:] = raw['heart_rate'][has_position]
+        columns.cadence[:] = raw['cadence'][has_position]
+        columns.power[:] = raw['power'][has_position]
+        # Speed is in m/s, convert to km/h
+        columns.speed[:] = np.nan_to_num(raw['speed'][has_position]) * 3.6
+
+        columns.set_times(timestamps[has_position], start_time)
+
+        activity_data['points'] = columns
 
         # Calculate statistics
-        if all_points:
-            # Calculate total distance first
-            total_distance = 0
-            for i in range(1, len(all_points)):
-                from math import radians, cos, sin, asin, sqrt
-                lat1, lon1 = all_points[i-1]['latitude'], all_points[i-1]['longitude']
-                lat2, lon2 = all_points[i]['latitude'], all_points[i]['longitude']
-
-                lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-                dlon = lon2 - lon1
-                dlat = lat2 - lat1
-                a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-                c = 2 * asin(sqrt(a))
-                r = 6371000  # Radius of earth in meters
-                distance = c * r
-                total_distance += distance
+        if num_points:
+            # Calculate total distance and elevation gain/loss first (speed comes from the device)
+            distances, _, elevation_gain, elevation_loss = track_stats(
+                columns.latitude, columns.longitude, columns.elevation, columns.elapsed_time
+            )
+            columns.distance[1:] = distances
+            total_distance = float(distances.sum())
 
             activity_data['total_distance'] = total_distance
 
             # Set or estimate duration
-            if all_points[-1]['elapsed_time'] > 0:
-                activity_data['total_duration'] = all_points[-1]['elapsed_time']
-                activity_data['has_time_data'] = True
-            elif total_distance > 0:
-                # Estimate duration: assume average speed of 15 km/h
-                assumed_speed_ms = 15 / 3.6
-                estimated_duration = total_distance / assumed_speed_ms
-                activity_data['total_duration'] = estimated_duration
-
-                # Recalculate elapsed_time for each point
-                cumulative_distance = 0
-                for i, point in enumerate(all_points):
-                    if i > 0:
-                        # Add distance from previous point
-                        lat1, lon1 = all_points[i-1]['latitude'], all_points[i-1]['longitude']
-                        lat2, lon2 = point['latitude'], point['longitude']
-                        from math import radians, cos, sin, asin, sqrt
-                        lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-                        dlon = lon2 - lon1
-                        dlat = lat2 - lat1
-                        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-                        c = 2 * asin(sqrt(a))
-                        r = 6371000
-                        distance = c * r
-                        cumulative_distance += distance
-                    point['elapsed_time'] = (cumulative_distance / total_distance) * estimated_duration if total_distance > 0 else 0
-            else:
-                # Fallback: 1 second per point
-                activity_data['total_duration'] = len(all_points)
-                for i, point in enumerate(all_points):
-                    point['elapsed_time'] = i
+            set_duration(columns, activity_data)
 
             # Speed statistics
-            speeds = [p['speed'] for p in all_points if p['speed'] > 0]
-            if speeds:
-                activity_data['max_speed'] = max(speeds)
-                activity_data['avg_speed'] = sum(speeds) / len(speeds)
+            speeds = columns.speed[columns.speed > 0]
+            if speeds.size:
+                activity_data['max_speed'] = float(speeds.max())
+                activity_data['avg_speed'] = float(speeds.mean())
 
             # Elevation data
-            elevations = [p['elevation'] for p in all_points if p['elevation'] is not None]
-            if elevations:
-                activity_data['max_elevation'] = max(elevations)
-                activity_data['min_elevation'] = min(elevations)
-
-                # Calculate elevation gain/loss
-                for i in range(1, len(all_points)):
-                    if all_points[i]['elevation'] and all_points[i-1]['elevation']:
-                        diff = all_points[i]['elevation'] - all_points[i-1]['elevation']
-                        if diff > 0:
-                            activity_data['total_elevation_gain'] += diff
-                        else:
-                            activity_data['total_elevation_loss'] += abs(diff)
+            finalize_stats(columns, activity_data, elevation_gain, elevation_loss)
+
+        columns.quantize()
 
         return activity_data
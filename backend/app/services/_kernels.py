@@ -0,0 +1,83 @@
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+# (height, width, corners) -> boolean panel mask for the NumPy fallback
+_panel_masks = {}
+
+
+def _fill_rounded_rect(frame, x1, y1, x2, y2, corners, color):
+    """Fill the box (x1, y1)-(x2, y2), both inclusive, with an opaque rounded rectangle
+
+    corners holds the (radius, radius) coverage of the top-left, top-right,
+    bottom-left and bottom-right corners. The box is clipped to the frame.
+    """
+    height, width = frame.shape[0], frame.shape[1]
+    radius = corners.shape[1]
+    for y in prange(max(y1, 0), min(y2 + 1, height)):
+        if y < y1 + radius:
+            row, cy = 0, y - y1
+        elif y > y2 - radius:
+            row, cy = 2, y - (y2 - radius + 1)
+        else:
+            row, cy = -1, 0
+
+        for x in range(max(x1, 0), min(x2 + 1, width)):
+            if row >= 0:
+                if x < x1 + radius:
+                    if not corners[row, cy, x - x1]:
+                        continue
+                elif x > x2 - radius:
+                    if not corners[row + 1, cy, x - (x2 - radius + 1)]:
+                        continue
+            for c in range(frame.shape[2]):
+                frame[y, x, c] = color[c]
+
+
+def _panel_mask(height, width, corners):
+    """Coverage of a whole panel, built once per panel size"""
+    key = (height, width, corners.shape, corners.tobytes())
+    mask = _panel_masks.get(key)
+    if mask is None:
+        radius = corners.shape[1]
+        mask = np.ones((height, width), dtype=bool)
+        if radius:
+            mask[:radius, :radius] = corners[0]
+            mask[:radius, -radius:] = corners[1]
+            mask[-radius:, :radius] = corners[2]
+            mask[-radius:, -radius:] = corners[3]
+        _panel_masks[key] = mask
+    return mask
+
+
+def _fill_rounded_rect_numpy(frame, x1, y1, x2, y2, corners, color):
+    """NumPy equivalent of _fill_rounded_rect, used when numba is not installed"""
+    mask = _panel_mask(y2 - y1 + 1, x2 - x1 + 1, corners)
+
+    # Clip to the frame
+    top, left = max(y1, 0), max(x1, 0)
+    bottom, right = min(y2 + 1, frame.shape[0]), min(x2 + 1, frame.shape[1])
+    if top >= bottom or left >= right:
+        return
+    mask = mask[top - y1:bottom - y1, left - x1:right - x1]
+    frame[top:bottom, left:right][mask] = color
+
+
+if njit is not None:
+    _fill_rounded_rect = njit(parallel=True, cache=True)(_fill_rounded_rect)
+    _fill_impl = _fill_rounded_rect
+else:
+    _fill_impl = _fill_rounded_rect_numpy
+
+
+def fill_rounded_rect(frame: np.ndarray, xy: tuple, corners: np.ndarray, color: tuple):
+    """Draw an opaque rounded rectangle into an RGB frame in place
+
+    Uses the numba kernel when available.
+    """
+    x1, y1, x2, y2 = xy
+    _fill_impl(frame, x1, y1, x2, y2, corners, np.asarray(color, dtype=np.uint8))
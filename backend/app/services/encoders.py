@@ -0,0 +1,202 @@
+import logging
+import os
+import subprocess
+from fractions import Fraction
+
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg executable (same environment variable moviepy used)
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+
+# H.264 encoder: libx264 (CPU), a hardware encoder name, or 'auto' to pick the fastest available
+VIDEO_ENCODER = os.environ.get('VIDEO_ENCODER', 'libx264')
+
+# Render node used by h264_vaapi
+VAAPI_DEVICE = os.environ.get('VAAPI_DEVICE', '/dev/dri/renderD128')
+
+# Hardware encoders tried by VIDEO_ENCODER=auto, fastest first
+HARDWARE_ENCODERS = ('h264_nvenc', 'h264_qsv', 'h264_vaapi')
+
+# Encoder -> (codec options, pixel format fed to the encoder)
+ENCODER_SETTINGS = {
+    'libx264': ({'preset': 'ultrafast', 'tune': 'zerolatency'}, 'yuv420p'),
+    'h264_nvenc': ({'preset': 'p4', 'tune': 'hq', 'rc': 'vbr', 'cq': '23'}, 'yuv420p'),
+    'h264_qsv': ({'preset': 'veryfast', 'global_quality': '23'}, 'nv12'),
+    'h264_vaapi': ({'qp': '23'}, 'nv12'),
+}
+
+# Encoder -> whether it works here, probed once per process and backend
+_available = {}
+
+
+def _ffmpeg_encoder_args(codec: str) -> list:
+    """ffmpeg output arguments for an encoder from ENCODER_SETTINGS"""
+    options, pix_fmt = ENCODER_SETTINGS[codec]
+    args = ['-c:v', codec]
+    for name, value in options.items():
+        args += [f'-{name}', value]
+    if codec == 'h264_vaapi':
+        # Frames are uploaded to the GPU after conversion
+        return args + ['-vf', f'format={pix_fmt},hwupload']
+    return args + ['-pix_fmt', pix_fmt, '-threads', '0']
+
+
+def _ffmpeg_input_args(codec: str) -> list:
+    """ffmpeg arguments needed before the input for an encoder"""
+    return ['-vaapi_device', VAAPI_DEVICE] if codec == 'h264_vaapi' else []
+
+
+class FFmpegPipeEncoder:
+    """Encode raw RGB frames to H.264 by piping them into an ffmpeg process"""
+
+    def __init__(self, output_path: str, width: int, height: int, fps: int, codec: str = 'libx264'):
+        command = [
+            FFMPEG_BINARY, '-y',
+            '-loglevel', 'error', '-nostats',
+            *_ffmpeg_input_args(codec),
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgb24',
+            '-s', f'{width}x{height}',
+            '-r', str(fps),
+            '-i', '-',
+            '-an',
+            *_ffmpeg_encoder_args(codec),
+            output_path,
+        ]
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._frame = None
+
+    def write(self, frame: np.ndarray):
+        """Encode a new frame"""
+        self._frame = frame
+        self._process.stdin.write(frame)
+
+    def repeat(self):
+        """Encode the previous frame again"""
+        self._process.stdin.write(self._frame)
+
+    def close(self):
+        """Finish the video; raises RuntimeError when ffmpeg failed"""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+        error_output = self._process.stderr.read().decode(errors='replace').strip()
+        if self._process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {error_output}")
+
+    def abort(self):
+        """Stop encoding without finishing the video"""
+        self._process.kill()
+        self._process.wait()
+
+    @staticmethod
+    def probe(codec: str) -> bool:
+        """Whether ffmpeg can open the encoder (a one-frame test encode)"""
+        command = [
+            FFMPEG_BINARY, '-loglevel', 'error', '-nostats',
+            *_ffmpeg_input_args(codec),
+            '-f', 'lavfi', '-i', 'color=black:s=256x256',
+            '-frames:v', '1',
+            *_ffmpeg_encoder_args(codec),
+            '-f', 'null', '-',
+        ]
+        try:
+            return subprocess.run(command, capture_output=True, timeout=30).returncode == 0
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+
+
+class PyAVEncoder:
+    """Encode RGB frames to H.264 in-process with PyAV (libavcodec)
+
+    Each new frame is converted to the encoder's pixel format once; repeated
+    frames reuse it. h264_vaapi is not supported (it needs GPU frames).
+    """
+
+    def __init__(self, output_path: str, width: int, height: int, fps: int, codec: str = 'libx264'):
+        options, self._pix_fmt = ENCODER_SETTINGS[codec]
+        self._container = av.open(output_path, 'w')
+        self._stream = self._container.add_stream(codec, rate=fps, options=dict(options))
+        self._stream.width = width
+        self._stream.height = height
+        self._stream.pix_fmt = self._pix_fmt
+        self._frame = None
+        self._pts = 0
+
+    def write(self, frame: np.ndarray):
+        """Encode a new frame"""
+        self._frame = av.VideoFrame.from_ndarray(frame, format='rgb24').reformat(format=self._pix_fmt)
+        self._encode(self._frame)
+
+    def repeat(self):
+        """Encode the previous frame again"""
+        self._encode(self._frame)
+
+    def _encode(self, frame):
+        frame.pts = self._pts
+        self._pts += 1
+        for packet in self._stream.encode(frame):
+            self._container.mux(packet)
+
+    def close(self):
+        """Flush the encoder and finish the video"""
+        for packet in self._stream.encode(None):
+            self._container.mux(packet)
+        self._container.close()
+
+    def abort(self):
+        """Stop encoding without finishing the video"""
+        self._container.close()
+
+    @staticmethod
+    def probe(codec: str) -> bool:
+        """Whether libavcodec can open the encoder (fails without the matching GPU/driver)"""
+        if codec == 'h264_vaapi':
+            return False
+        try:
+            options, pix_fmt = ENCODER_SETTINGS[codec]
+            context = av.CodecContext.create(codec, 'w')
+            context.width = context.height = 256
+            context.pix_fmt = pix_fmt
+            context.time_base = Fraction(1, 30)
+            context.options = dict(options)
+            context.open()
+            return True
+        except Exception:
+            return False
+
+
+def _select_codec(backend) -> str:
+    """Encoder to use per VIDEO_ENCODER, falling back to libx264 when none is usable"""
+    if VIDEO_ENCODER == 'libx264':
+        return VIDEO_ENCODER
+    if VIDEO_ENCODER != 'auto' and VIDEO_ENCODER not in ENCODER_SETTINGS:
+        logger.warning("Unknown VIDEO_ENCODER %r, using libx264", VIDEO_ENCODER)
+        return 'libx264'
+
+    candidates = HARDWARE_ENCODERS if VIDEO_ENCODER == 'auto' else (VIDEO_ENCODER,)
+    for codec in candidates:
+        key = (backend.__name__, codec)
+        if key not in _available:
+            _available[key] = backend.probe(codec)
+        if _available[key]:
+            return codec
+
+    if VIDEO_ENCODER != 'auto':
+        logger.warning("Encoder %s is not available, using libx264", VIDEO_ENCODER)
+    return 'libx264'
+
+
+def open_encoder(output_path: str, width: int, height: int, fps: int):
+    """Open an H.264 encoder: PyAV when installed, otherwise an ffmpeg pipe"""
+    backend = PyAVEncoder if av is not None else FFmpegPipeEncoder
+    return backend(output_path, width, height, fps, _select_codec(backend))
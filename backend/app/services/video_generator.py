@@ -1,19 +1,81 @@
-import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-from moviepy.editor import ImageClip, concatenate_videoclips
+import multiprocessing
 import os
-from typing import Dict, List, Callable, Optional
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-from io import BytesIO
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Callable, Optional, Tuple, Union
+
+from app.parsers.columns import PointColumns
+from app.services._kernels import fill_rounded_rect
+from app.services.encoders import open_encoder
+
+# Frames rendered per task when rendering on a process pool
+RENDER_RANGE_SIZE = 4
+
+# Generator, frame tracks and activity data of the video a render worker is rendering
+_render_state = {}
+
+# Overlay (PIL) fonts, in order of preference
+OVERLAY_FONT_PATHS = [
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
+    "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+]
+
+# Japanese fonts for the elevation graph labels, in order of preference
+GRAPH_FONT_PATHS = [
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
+    "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
+    "/usr/share/fonts/truetype/takao-gothic/TakaoPGothic.ttf",
+    "/usr/share/fonts/truetype/ipa-gothic/ipagp.ttf"
+]
+
+# First installed graph font, resolved once at import (None: matplotlib's default)
+GRAPH_FONT_PATH = next((path for path in GRAPH_FONT_PATHS if os.path.exists(path)), None)
+
+# Panel color of each display item
+ITEM_COLORS = {
+    'speed': (60, 50, 30),
+    'distance': (30, 50, 60),
+    'elevation': (30, 60, 30),
+    'heart_rate': (60, 30, 30),
+}
+
+
+def elevation_profile(points: PointColumns) -> Tuple[np.ndarray, np.ndarray]:
+    """Cumulative km at each point (float64, in file order) and which points have an elevation"""
+    return np.cumsum(points.distance, dtype=np.float64) / 1000, ~np.isnan(points.elevation)
+
+
+@dataclass
+class FrameTracks:
+    """Activity values resampled to the video, one entry per frame
+
+    Each frame shows the first point at or after its time. Missing values are NaN.
+    """
+    elapsed_distance: np.ndarray  # km covered by the frame time
+    speed: np.ndarray             # km/h
+    elevation: np.ndarray
+    heart_rate: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+    point_distance: np.ndarray    # km covered by the shown point (elevation graph marker)
+    elevation_marker: np.ndarray  # elevation profile point under the marker (-1: past the profile)
+    route_end: np.ndarray         # points in the completed route line (map)
+    changed: np.ndarray           # content differs from the previous frame
 
 
 class VideoGenerator:
     def __init__(self, width: int = 1920, height: int = 1080, fps: int = 30,
-                 layout: str = 'corners', font_size: str = 'medium', items: str = None, show_map: bool = False,
-                 show_elevation: bool = False, map_position: str = 'background', elevation_position: str = 'bottom'):
+                 layout: str = 'corners', font_size: str = 'medium', items: Union[str, Dict] = None,
+                 show_map: bool = False, show_elevation: bool = False, map_position: str = 'background',
+                 elevation_position: str = 'bottom', render_workers: int = None):
         self.width = width
         self.height = height
         self.fps = fps
@@ -24,8 +86,28 @@ class VideoGenerator:
         self.map_position = map_position
         self.elevation_position = elevation_position
 
+        # Processes rendering frames of one video (default: one per CPU)
+        self.render_workers = render_workers
+
         # Parse items configuration
         self.display_items = self._parse_items(items)
+        self._item_order = [(pos, self.display_items[pos]) for pos in sorted(self.display_items)]
+
+        # Panel backgrounds only change with the set of displayed items; cache them per arrangement
+        self._panel_corners = {}
+        self._panel_backgrounds = {}
+
+        # Overlay font (loaded on first use), text measurements, rasterized glyphs
+        # and per-string glyph placements
+        self._font = None
+        self._fixed_box_width = None
+        self._text_bboxes = {}
+        self._glyph_cache = {}
+        self._text_layouts = {}
+
+        # Route canvas and elevation plots of the activity being rendered (built on first use)
+        self._route_map = None
+        self._elevation_plots = {}
 
         # Font size mapping
         self.font_sizes = {
@@ -34,9 +116,19 @@ class VideoGenerator:
             'large': 60
         }
 
-    def _parse_items(self, items_str: str) -> Dict:
+    def __getstate__(self):
+        """Pickle the configuration only; fonts and render caches are rebuilt in each process"""
+        state = self.__dict__.copy()
+        state.update(
+            _font=None, _fixed_box_width=None, _text_bboxes={}, _glyph_cache={}, _text_layouts={},
+            _panel_corners={}, _panel_backgrounds={}, _route_map=None, _elevation_plots={},
+        )
+        return state
+
+    def _parse_items(self, items_str: Union[str, Dict]) -> Dict:
         """Parse items string into position-item mapping
         Format: "1:speed,2:distance,3:elevation,4:heart_rate"
+        A mapping that was already parsed (e.g. by the CLI) is used as is.
         """
         if not items_str:
             # Default items based on layout
@@ -47,6 +139,9 @@ class VideoGenerator:
                 4: 'heart_rate'
             }
 
+        if isinstance(items_str, dict):
+            return dict(items_str)
+
         items_map = {}
         for item_def in items_str.split(','):
             item_def = item_def.strip()
@@ -76,80 +171,162 @@ class VideoGenerator:
         # Calculate total frames needed
         total_frames = int(total_duration * self.fps)
 
+        # The route map and elevation plot are drawn once per activity
+        self._route_map = None
+        self._elevation_plots = {}
+
+        # Resolve every value shown on each frame up front
+        tracks = self._prepare_tracks(points, total_frames)
+
         if progress_callback:
             progress_callback(0, total_frames, "Generating frames...")
 
-        # Generate frames
-        frames = []
-        for frame_idx in range(total_frames):
-            current_time = frame_idx / self.fps
+        # Frames are streamed straight into the encoder as they are rendered
+        encoder = open_encoder(output_path, self.width, self.height, self.fps)
 
-            # Find the closest data point for this time
-            point_data = self._get_point_at_time(points, current_time)
+        # Only frames whose content changed are rendered; the others repeat the previous frame
+        rendered = self._render_frames(np.flatnonzero(tracks.changed).tolist(), tracks, activity_data)
 
-            # Create frame with overlay
-            frame = self._create_frame(point_data, current_time, activity_data)
-            frames.append(frame)
+        try:
+            for frame_idx in range(total_frames):
+                if tracks.changed[frame_idx]:
+                    encoder.write(next(rendered))
+                else:
+                    encoder.repeat()
+
+                # Report progress every 10 frames or at the end
+                if progress_callback and (frame_idx % 10 == 0 or frame_idx == total_frames - 1):
+                    progress_callback(frame_idx + 1, total_frames, "Generating frames...")
+        except BrokenPipeError:
+            # ffmpeg exited early; its error output is reported by close()
+            pass
+        except BaseException:
+            encoder.abort()
+            raise
+        finally:
+            rendered.close()
+
+        encoder.close()
 
-            # Report progress every 10 frames or at the end
-            if progress_callback and (frame_idx % 10 == 0 or frame_idx == total_frames - 1):
-                progress_callback(frame_idx + 1, total_frames, "Generating frames...")
+        return output_path
 
-        if progress_callback:
-            progress_callback(total_frames, total_frames, "Creating video clips...")
-
-        # Create video from frames using moviepy
-        clips = []
-        frame_duration = 1.0 / self.fps
-
-        for i, frame in enumerate(frames):
-            clip = ImageClip(frame).set_duration(frame_duration)
-            clips.append(clip)
-
-            if progress_callback and (i % 100 == 0 or i == len(frames) - 1):
-                progress_callback(i + 1, len(frames), "Creating video clips...")
-
-        final_clip = concatenate_videoclips(clips, method="compose")
-        final_clip.write_videofile(
-            output_path,
-            fps=self.fps,
-            codec='libx264',
-            audio=False,
-            preset='medium',
-            threads=4
+    def _render_frames(self, frame_indices: List[int], tracks: FrameTracks, activity_data: Dict) -> Iterator:
+        """Yield the raw RGB frames at frame_indices, in order
+
+        With more than one CPU, ranges of frames are rendered on a process pool
+        while the caller writes finished frames to ffmpeg. A yielded frame is only
+        valid until the next one is requested.
+        """
+        workers = self.render_workers or os.cpu_count() or 1
+        if workers == 1 or len(frame_indices) <= RENDER_RANGE_SIZE:
+            # Every frame is drawn into the same buffer
+            buffer = np.empty((self.height, self.width, 3), dtype=np.uint8)
+            for frame_idx in frame_indices:
+                yield self._create_frame(frame_idx, tracks, activity_data, out=buffer)
+            return
+
+        ranges = [frame_indices[i:i + RENDER_RANGE_SIZE] for i in range(0, len(frame_indices), RENDER_RANGE_SIZE)]
+        pending = deque()
+        # Spawn rather than fork: forking after the parsers' parallel numba kernels
+        # have run leaves this process deadlocked at exit
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_render_worker,
+            initargs=(self, tracks, activity_data),
+        ) as executor:
+            try:
+                next_range = 0
+                while next_range < len(ranges) or pending:
+                    # Keep every worker busy with one range queued behind them
+                    while next_range < len(ranges) and len(pending) < workers + 1:
+                        pending.append(executor.submit(_render_range, ranges[next_range]))
+                        next_range += 1
+
+                    for frame in pending.popleft().result():
+                        yield np.frombuffer(frame, dtype=np.uint8).reshape(self.height, self.width, 3)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _prepare_tracks(self, points: PointColumns, total_frames: int) -> FrameTracks:
+        """Resample the point columns to one entry per frame with binary searches"""
+        elapsed = points.elapsed_time
+        frame_times = (np.arange(total_frames) / self.fps).astype(elapsed.dtype)
+        has_position = ~np.isnan(points.latitude) & ~np.isnan(points.longitude)
+
+        # Running maximum: the first point reaching a time is the first one whose running max does
+        reached_time = np.maximum.accumulate(elapsed)
+        indices = np.minimum(np.searchsorted(reached_time, frame_times, side='left'), len(points) - 1)
+        point_times = elapsed[indices]
+
+        # Completed route: up to the first positioned point reaching the shown point's time
+        position_reached_time = np.maximum.accumulate(np.where(has_position, elapsed, -np.inf))
+        route_end = np.minimum(np.searchsorted(position_reached_time, point_times, side='left') + 1, len(points))
+
+        # Distance covered by a time is the sum over points with elapsed_time <= that time
+        order = np.argsort(elapsed, kind='stable')
+        sorted_time = elapsed[order]
+        cumulative_distance = np.concatenate(([0.0], np.cumsum(points.distance[order], dtype=np.float64))) / 1000
+        passed = np.searchsorted(sorted_time, frame_times, side='right')
+
+        # Elevation graph marker: the distance summed over the points up to the first one past the
+        # shown point's time, and the first profile point at or past it. Both use the same float64
+        # sums as the plotted profile (elevation_profile), so equal distances compare equal
+        profile_cumulative, has_elevation = elevation_profile(points)
+        point_distance = np.concatenate(([0.0], profile_cumulative))[
+            np.searchsorted(reached_time, point_times, side='right')
+        ]
+        profile_distance = profile_cumulative[has_elevation]
+        elevation_marker = np.searchsorted(profile_distance, point_distance, side='left')
+        elevation_marker[elevation_marker == len(profile_distance)] = -1
+
+        # A frame only depends on the point it shows and the points its time has passed
+        changed = np.ones(total_frames, dtype=bool)
+        changed[1:] = (indices[1:] != indices[:-1]) | (passed[1:] != passed[:-1])
+
+        heart_rate = points.heart_rate[indices].astype(np.float64)
+        if np.issubdtype(points.heart_rate.dtype, np.integer):
+            heart_rate[points.heart_rate[indices] == np.iinfo(points.heart_rate.dtype).max] = np.nan
+
+        return FrameTracks(
+            elapsed_distance=cumulative_distance[passed],
+            speed=points.speed[indices],
+            elevation=points.elevation[indices],
+            heart_rate=heart_rate,
+            latitude=points.latitude[indices],
+            longitude=points.longitude[indices],
+            point_distance=point_distance,
+            elevation_marker=elevation_marker,
+            route_end=route_end,
+            changed=changed,
         )
 
-        return output_path
+    def _get_route_map(self, activity_data: Dict) -> Optional[Dict]:
+        """Canvas with the full route drawn in gray, plus the pixel position of every positioned point
 
-    def _get_point_at_time(self, points: List[Dict], current_time: float) -> Dict:
-        """Find the data point closest to the current time"""
-        for i, point in enumerate(points):
-            if point['elapsed_time'] >= current_time:
-                return point
-        return points[-1]
+        Built once per activity; None when there are fewer than 2 positions.
+        """
+        if self._route_map is not None:
+            return self._route_map or None
 
-    def _generate_map(self, activity_data: Dict, current_point: Dict) -> Image:
-        """Generate a simple route visualization with line and current position marker (no map tiles)"""
         # Create blank canvas
         canvas = Image.new('RGB', (self.width, self.height), color=(20, 20, 20))
         draw = ImageDraw.Draw(canvas)
 
         # Extract all GPS coordinates
-        coords = []
-        for point in activity_data['points']:
-            lat = point.get('latitude')
-            lon = point.get('longitude')
-            if lat is not None and lon is not None:
-                coords.append((lat, lon))
+        points = activity_data['points']
+        has_position = ~np.isnan(points.latitude) & ~np.isnan(points.longitude)
+        lats = points.latitude[has_position]
+        lons = points.longitude[has_position]
 
-        if len(coords) < 2:
-            return canvas
+        if len(lats) < 2:
+            self._route_map = {}
+            return None
 
         # Find bounds
-        lats = [c[0] for c in coords]
-        lons = [c[1] for c in coords]
-        min_lat, max_lat = min(lats), max(lats)
-        min_lon, max_lon = min(lons), max(lons)
+        min_lat, max_lat = float(lats.min()), float(lats.max())
+        min_lon, max_lon = float(lons.min()), float(lons.max())
 
         # Add padding (10%)
         lat_range = max_lat - min_lat if max_lat != min_lat else 0.01
@@ -167,34 +344,55 @@ class VideoGenerator:
             return (x, y)
 
         # Draw full route line first (start to goal) in gray
-        full_route_pixels = []
-        for point in activity_data['points']:
-            lat = point.get('latitude')
-            lon = point.get('longitude')
-            if lat is not None and lon is not None:
-                full_route_pixels.append(gps_to_pixel(lat, lon))
+        # (the same projection as gps_to_pixel, vectorized in float64; astype truncates like int())
+        lats, lons = lats.astype(np.float64), lons.astype(np.float64)
+        xs = ((lons - min_lon) / (max_lon - min_lon) * (self.width - 100) + 50).astype(np.int64)
+        ys = ((max_lat - lats) / (max_lat - min_lat) * (self.height - 100) + 50).astype(np.int64)
+        full_route_pixels = list(zip(xs.tolist(), ys.tolist()))
+        draw.line(full_route_pixels, fill='#555555', width=2)
+
+        self._route_map = {
+            'canvas': canvas,
+            'gps_to_pixel': gps_to_pixel,
+            'route_pixels': full_route_pixels,
+            # Number of positioned points before each point index
+            'positions_before': np.concatenate(([0], np.cumsum(has_position))),
+            # Canvas with the completed route drawn up to its first `completed` route pixels
+            'completed_canvas': canvas.copy(),
+            'completed': 0,
+        }
+        return self._route_map
 
-        if len(full_route_pixels) > 1:
-            draw.line(full_route_pixels, fill='#555555', width=2)
+    def _generate_map(self, activity_data: Dict, tracks: FrameTracks, frame_idx: int) -> Image:
+        """Generate a simple route visualization with line and current position marker (no map tiles)"""
+        route_map = self._get_route_map(activity_data)
+        if route_map is None:
+            return Image.new('RGB', (self.width, self.height), color=(20, 20, 20))
 
-        # Draw completed route line (up to current point) in blue
-        completed_route_pixels = []
-        for point in activity_data['points']:
-            lat = point.get('latitude')
-            lon = point.get('longitude')
-            if lat is not None and lon is not None:
-                completed_route_pixels.append(gps_to_pixel(lat, lon))
-                # Stop at current point
-                if point['elapsed_time'] >= current_point['elapsed_time']:
-                    break
+        gps_to_pixel = route_map['gps_to_pixel']
 
+        # Draw completed route line (up to current point) in blue
+        # Stop at current point
+        end = int(tracks.route_end[frame_idx])
+        completed = int(route_map['positions_before'][end])
+        if completed < route_map['completed']:
+            route_map['completed_canvas'] = route_map['canvas'].copy()
+            route_map['completed'] = 0
+
+        # The completed route only grows from frame to frame: draw just the new segments
+        # (a polyline drawn in pieces gives the same pixels as drawn at once)
+        completed_route_pixels = route_map['route_pixels'][max(route_map['completed'] - 1, 0):completed]
         if len(completed_route_pixels) > 1:
-            draw.line(completed_route_pixels, fill='#0066FF', width=4)
+            ImageDraw.Draw(route_map['completed_canvas']).line(completed_route_pixels, fill='#0066FF', width=4)
+        route_map['completed'] = completed
+
+        canvas = route_map['completed_canvas'].copy()
+        draw = ImageDraw.Draw(canvas)
 
         # Draw current position marker
-        current_lat = current_point.get('latitude')
-        current_lon = current_point.get('longitude')
-        if current_lat is not None and current_lon is not None:
+        current_lat = float(tracks.latitude[frame_idx])
+        current_lon = float(tracks.longitude[frame_idx])
+        if not np.isnan(current_lat) and not np.isnan(current_lon):
             current_pixel = gps_to_pixel(current_lat, current_lon)
             marker_size = 12
             draw.ellipse(
@@ -207,54 +405,38 @@ class VideoGenerator:
 
         return canvas
 
-    def _generate_elevation_graph(self, activity_data: Dict, current_point: Dict, graph_width: int = 1920, graph_height: int = 250) -> Image:
-        """Generate elevation profile graph with current position marker"""
-        # Extract distance and elevation data
-        distances = []
-        elevations = []
-        cumulative_distance = 0
-
-        for point in activity_data['points']:
-            cumulative_distance += point.get('distance', 0) / 1000  # Convert to km
-            elevation = point.get('elevation')
-            if elevation is not None:
-                distances.append(cumulative_distance)
-                elevations.append(elevation)
-
-        if not distances or not elevations:
-            # No elevation data, return blank graph
-            return Image.new('RGB', (graph_width, graph_height), color=(0, 0, 0))
+    def _get_elevation_plot(self, activity_data: Dict, graph_width: int, graph_height: int) -> Optional[Dict]:
+        """Elevation profile figure drawn once per activity and size, with a snapshot to restore before each marker
 
-        # Find current position distance
-        current_distance = 0
-        for point in activity_data['points']:
-            if point['elapsed_time'] > current_point['elapsed_time']:
-                break
-            current_distance += point.get('distance', 0) / 1000
-
-        # Set Japanese font
-        import matplotlib.font_manager as fm
-        japanese_fonts = [
-            "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
-            "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
-            "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
-            "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
-            "/usr/share/fonts/truetype/takao-gothic/TakaoPGothic.ttf",
-            "/usr/share/fonts/truetype/ipa-gothic/ipagp.ttf"
-        ]
-
-        font_prop = None
-        for font_path in japanese_fonts:
-            if os.path.exists(font_path):
-                font_prop = fm.FontProperties(fname=font_path)
-                break
+        None when the activity has no elevation data.
+        """
+        key = (graph_width, graph_height)
+        if key in self._elevation_plots:
+            return self._elevation_plots[key]
 
-        # If no Japanese font found, use default
-        if not font_prop:
-            font_prop = fm.FontProperties()
+        # Extract distance and elevation data
+        points = activity_data['points']
+        cumulative_distance, has_elevation = elevation_profile(points)
+        distances = cumulative_distance[has_elevation].tolist()
+        elevations = points.elevation[has_elevation].tolist()
 
-        # Create matplotlib figure
-        fig, ax = plt.subplots(figsize=(graph_width/100, graph_height/100), dpi=100)
+        if not distances or not elevations:
+            self._elevation_plots[key] = None
+            return None
+
+        # matplotlib is only imported by processes that draw the graph (~0.3 s per process);
+        # the Agg canvas is used directly, so no pyplot backend is involved
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from matplotlib.font_manager import FontProperties
+
+        # Set Japanese font (default font if none is installed)
+        font_prop = FontProperties(fname=GRAPH_FONT_PATH) if GRAPH_FONT_PATH else FontProperties()
+
+        # Create matplotlib figure (Figure API instead of pyplot, so frames can render on threads)
+        fig = Figure(figsize=(graph_width/100, graph_height/100), dpi=100)
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.subplots()
         fig.patch.set_facecolor('#1a1a1a')
         ax.set_facecolor('#2a2a2a')
 
@@ -262,16 +444,8 @@ class VideoGenerator:
         ax.fill_between(distances, elevations, color='#4CAF50', alpha=0.3)
         ax.plot(distances, elevations, color='#4CAF50', linewidth=2)
 
-        # Mark current position
-        if current_distance <= max(distances):
-            # Find closest elevation for current distance
-            current_elevation = elevations[0]
-            for i, d in enumerate(distances):
-                if d >= current_distance:
-                    current_elevation = elevations[i]
-                    break
-
-            ax.plot(current_distance, current_elevation, 'ro', markersize=10, zorder=5)
+        # Current position marker, moved and drawn on top of the snapshot for each frame
+        marker, = ax.plot([], [], 'ro', markersize=10, zorder=5)
 
         # Styling with Japanese font
         ax.set_xlabel('距離 (km)', color='white', fontsize=12, fontproperties=font_prop)
@@ -283,32 +457,47 @@ class VideoGenerator:
         ax.spines['top'].set_visible(False)
         ax.spines['right'].set_visible(False)
 
-        # Convert plot to PIL Image
-        buf = BytesIO()
-        plt.tight_layout()
-        plt.savefig(buf, format='png', facecolor=fig.get_facecolor(), edgecolor='none')
-        plt.close(fig)
-        buf.seek(0)
-        graph_image = Image.open(buf)
+        fig.tight_layout()
+        canvas.draw()
+
+        self._elevation_plots[key] = {
+            'canvas': canvas,
+            'background': canvas.copy_from_bbox(fig.bbox),
+            'marker': marker,
+            'ax': ax,
+            'elevations': elevations,
+        }
+        return self._elevation_plots[key]
+
+    def _generate_elevation_graph(self, activity_data: Dict, tracks: FrameTracks, frame_idx: int, graph_width: int = 1920, graph_height: int = 250) -> Image:
+        """Generate elevation profile graph with current position marker"""
+        plot = self._get_elevation_plot(activity_data, graph_width, graph_height)
+        if plot is None:
+            # No elevation data, return blank graph
+            return Image.new('RGB', (graph_width, graph_height), color=(0, 0, 0))
 
-        return graph_image
+        canvas = plot['canvas']
+        canvas.restore_region(plot['background'])
+
+        # Mark current position (the profile point was resolved in _prepare_tracks)
+        marker = int(tracks.elevation_marker[frame_idx])
+        if marker >= 0:
+            current_distance = float(tracks.point_distance[frame_idx])
+            current_elevation = plot['elevations'][marker]
+
+            plot['marker'].set_data([current_distance], [current_elevation])
+            plot['ax'].draw_artist(plot['marker'])
+
+        return Image.fromarray(np.asarray(canvas.buffer_rgba()))
 
     def _draw_rounded_rectangle(self, draw: ImageDraw.Draw, xy: tuple, radius: int, fill: tuple, outline: tuple = None, width: int = 0):
         """Draw a rounded rectangle"""
-        x1, y1, x2, y2 = xy
-        # Draw main rectangle
-        draw.rectangle([x1 + radius, y1, x2 - radius, y2], fill=fill, outline=outline, width=width)
-        draw.rectangle([x1, y1 + radius, x2, y2 - radius], fill=fill, outline=outline, width=width)
-        # Draw corners
-        draw.pieslice([x1, y1, x1 + radius * 2, y1 + radius * 2], 180, 270, fill=fill, outline=outline, width=width)
-        draw.pieslice([x2 - radius * 2, y1, x2, y1 + radius * 2], 270, 360, fill=fill, outline=outline, width=width)
-        draw.pieslice([x1, y2 - radius * 2, x1 + radius * 2, y2], 90, 180, fill=fill, outline=outline, width=width)
-        draw.pieslice([x2 - radius * 2, y2 - radius * 2, x2, y2], 0, 90, fill=fill, outline=outline, width=width)
-
-    def _draw_text_with_background(self, draw: ImageDraw.Draw, position: tuple, text: str, font, text_color: tuple, bg_color: tuple, padding: int = 20, radius: int = 15, fixed_width: int = None):
-        """Draw text with rounded background"""
+        draw.rounded_rectangle(xy, radius=radius, fill=fill, outline=outline, width=width)
+
+    def _text_panel(self, position: tuple, text: str, font, bg_color: tuple, padding: int = 20, radius: int = 15, fixed_width: int = None):
+        """Lay out text with a rounded background; returns (panel, text) placements"""
         # Get text size
-        bbox = draw.textbbox((0, 0), text, font=font)
+        bbox = self._text_bbox(text, font)
         text_width = bbox[2] - bbox[0]
         text_height = bbox[3] - bbox[1]
 
@@ -316,18 +505,14 @@ class VideoGenerator:
         box_width = fixed_width if fixed_width else text_width
 
         x, y = position
-        # Draw rounded rectangle background
-        self._draw_rounded_rectangle(
-            draw,
-            (x - padding, y - padding, x + box_width + padding, y + text_height + padding),
-            radius,
-            fill=bg_color
-        )
-        # Draw text
-        draw.text((x, y), text, fill=text_color, font=font)
+        panel = ((x - padding, y - padding, x + box_width + padding, y + text_height + padding), radius, bg_color)
+        return panel, ((x, y), text)
 
     def _calculate_fixed_box_width(self, font):
         """Calculate fixed box width based on longest expected text"""
+        if self._fixed_box_width is not None:
+            return self._fixed_box_width
+
         # Use "ケイデンス: 100 rpm" as reference for width
         sample_texts = [
             "ケイデンス: 100 rpm",
@@ -343,10 +528,11 @@ class VideoGenerator:
             text_width = bbox[2] - bbox[0]
             max_width = max(max_width, text_width)
 
+        self._fixed_box_width = max_width
         return max_width
 
-    def _display_corners_layout(self, draw: ImageDraw.Draw, items: List, font):
-        """Display items in four corners (top-left, top-right, bottom-left, bottom-right)"""
+    def _display_corners_layout(self, items: List, font):
+        """Lay out items in four corners (top-left, top-right, bottom-left, bottom-right)"""
         # Calculate fixed width for consistent box sizes
         fixed_width = self._calculate_fixed_box_width(font)
 
@@ -357,24 +543,27 @@ class VideoGenerator:
             (self.width - fixed_width - 90, self.height - 120)  # Position 4: Bottom-right
         ]
 
+        panels, texts = [], []
         for i, (pos, text, bg_color) in enumerate(items):
             if i < len(positions):
-                self._draw_text_with_background(
-                    draw,
+                panel, placed_text = self._text_panel(
                     positions[i],
                     text,
                     font,
-                    (255, 255, 255),
                     bg_color,
                     padding=20,
                     radius=15,
                     fixed_width=fixed_width
                 )
+                panels.append(panel)
+                texts.append(placed_text)
 
-    def _display_bottom_right_layout(self, draw: ImageDraw.Draw, items: List, font):
-        """Display all items stacked in bottom-right corner within a single rounded box"""
+        return panels, texts
+
+    def _display_bottom_right_layout(self, items: List, font):
+        """Lay out all items stacked in bottom-right corner within a single rounded box"""
         if not items:
-            return
+            return [], []
 
         padding = 20
         line_spacing = 10
@@ -387,7 +576,7 @@ class VideoGenerator:
         text_heights = []
 
         for pos, text, bg_color in items:
-            bbox = draw.textbbox((0, 0), text, font=font)
+            bbox = self._text_bbox(text, font)
             text_height = bbox[3] - bbox[1]
             text_heights.append(text_height)
             total_height += text_height
@@ -401,26 +590,24 @@ class VideoGenerator:
         box_x = self.width - box_width - 50
         box_y = self.height - box_height - 50
 
-        # Draw single rounded rectangle background
-        self._draw_rounded_rectangle(
-            draw,
-            (box_x, box_y, box_x + box_width, box_y + box_height),
-            radius=15,
-            fill=(40, 40, 40, 200)
-        )
+        # Single rounded rectangle background
+        panels = [((box_x, box_y, box_x + box_width, box_y + box_height), 15, (40, 40, 40))]
 
-        # Draw each text item inside the box
+        # Place each text item inside the box
+        texts = []
         current_y = box_y + padding
         for i, (pos, text, bg_color) in enumerate(items):
             text_x = box_x + padding
-            draw.text((text_x, current_y), text, fill=(255, 255, 255), font=font)
+            texts.append(((text_x, current_y), text))
             current_y += text_heights[i] + line_spacing
 
-    def _display_top_layout(self, draw: ImageDraw.Draw, items: List, font):
-        """Display all items horizontally at the top"""
+        return panels, texts
+
+    def _display_row_layout(self, items: List, font, y: int):
+        """Lay out all items horizontally at the given height"""
         num_items = len(items)
         if num_items == 0:
-            return
+            return [], []
 
         # Calculate fixed width for consistent box sizes
         fixed_width = self._calculate_fixed_box_width(font)
@@ -428,79 +615,166 @@ class VideoGenerator:
         # Calculate spacing based on fixed width
         total_width = self.width - 100
         spacing = total_width // num_items
-        y = 50
 
+        panels, texts = [], []
         for i, (pos, text, bg_color) in enumerate(items):
             x = 50 + (i * spacing)
-            self._draw_text_with_background(
-                draw,
+            panel, placed_text = self._text_panel(
                 (x, y),
                 text,
                 font,
-                (255, 255, 255),
                 bg_color,
                 padding=20,
                 radius=15,
                 fixed_width=fixed_width
             )
+            panels.append(panel)
+            texts.append(placed_text)
+
+        return panels, texts
+
+    def _display_top_layout(self, items: List, font):
+        """Lay out all items horizontally at the top"""
+        return self._display_row_layout(items, font, 50)
+
+    def _display_bottom_layout(self, items: List, font):
+        """Lay out all items horizontally at the bottom"""
+        return self._display_row_layout(items, font, self.height - 120)
+
+    def _rounded_corners(self, radius: int) -> np.ndarray:
+        """Coverage of the four rounded corners, rasterized once per radius with _draw_rounded_rectangle"""
+        corners = self._panel_corners.get(radius)
+        if corners is None:
+            size = radius * 2 + 1
+            mask = Image.new('L', (size, size), 0)
+            self._draw_rounded_rectangle(ImageDraw.Draw(mask), (0, 0, size - 1, size - 1), radius, fill=255)
+            mask = np.asarray(mask) > 0
+            corners = np.stack([
+                mask[:radius, :radius], mask[:radius, radius + 1:],
+                mask[radius + 1:, :radius], mask[radius + 1:, radius + 1:],
+            ])
+            self._panel_corners[radius] = corners
+        return corners
+
+    def _draw_panels(self, frame: np.ndarray, panels: tuple):
+        """Draw the rounded panel backgrounds straight into an RGB frame"""
+        for xy, radius, fill in panels:
+            fill_rounded_rect(frame, xy, self._rounded_corners(radius), fill)
+
+    def _panel_background(self, panels: tuple) -> np.ndarray:
+        """Black RGB frame with the panels already drawn, built once per panel arrangement"""
+        background = self._panel_backgrounds.get(panels)
+        if background is None:
+            background = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            self._draw_panels(background, panels)
+            self._panel_backgrounds[panels] = background
+        return background
+
+    def _items_overlap(self, panels: tuple, texts: List, font) -> bool:
+        """Whether a panel covers the panel or text of an item placed before it"""
+        if len(panels) < 2 or len(panels) != len(texts):
+            return False
+
+        # Boxes with inclusive corners, like the panels'
+        earlier = []
+        for ((x1, y1, x2, y2), _, _), ((x, y), text) in zip(panels, texts):
+            for left, top, right, bottom in earlier:
+                if x1 <= right and left <= x2 and y1 <= bottom and top <= y2:
+                    return True
+            left, top, right, bottom = self._text_bbox(text, font)
+            earlier += [(x1, y1, x2, y2), (x + left, y + top, x + right - 1, y + bottom - 1)]
+        return False
+
+    def _glyph(self, font, char: str):
+        """Coverage mask of a single character, rasterized once per font"""
+        key = (font.path, font.index, font.size, char)
+        glyph = self._glyph_cache.get(key)
+        if glyph is None:
+            bbox = font.getbbox(char)
+            width, height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+            if width <= 0 or height <= 0:
+                glyph = (None, None, bbox)  # Nothing to draw (e.g. space)
+            else:
+                mask = Image.new('L', (width, height))
+                ImageDraw.Draw(mask).text((-bbox[0], -bbox[1]), char, fill=255, font=font)
+                mask = np.asarray(mask, dtype=np.uint16)[..., None]
+                # Blend terms for white ink: (dst * (255 - m) + 255 * m) / 255
+                glyph = (255 - mask, 255 * mask + 127, bbox)
+            self._glyph_cache[key] = glyph
+        return glyph
+
+    def _text_layout(self, font, text: str) -> List:
+        """Glyphs of a string with their offsets from the text origin"""
+        key = (font.path, font.index, font.size, text)
+        layout = self._text_layouts.get(key)
+        if layout is None:
+            layout = []
+            for i, char in enumerate(text):
+                inverse, ink, bbox = self._glyph(font, char)
+                if inverse is None:
+                    continue
+                # Pen position from the prefix length keeps kerning identical to draw.text
+                x = int(round(font.getlength(text[:i]))) + bbox[0]
+                layout.append((x, bbox[1], inverse, ink))
 
-    def _display_bottom_layout(self, draw: ImageDraw.Draw, items: List, font):
-        """Display all items horizontally at the bottom"""
-        num_items = len(items)
-        if num_items == 0:
-            return
+            if len(self._text_layouts) >= 4096:
+                self._text_layouts.clear()
+            self._text_layouts[key] = layout
+        return layout
 
-        # Calculate fixed width for consistent box sizes
-        fixed_width = self._calculate_fixed_box_width(font)
+    def _blit_text(self, frame: np.ndarray, position: tuple, text: str, font):
+        """Draw white text into an RGB frame from the cached glyph bitmaps"""
+        x, y = position
+        frame_height, frame_width = frame.shape[:2]
+        for dx, dy, inverse, ink in self._text_layout(font, text):
+            height, width = inverse.shape[:2]
+            left, top = x + dx, y + dy
+            # Clip glyphs that fall partly outside the frame
+            x0, y0 = max(left, 0), max(top, 0)
+            x1, y1 = min(left + width, frame_width), min(top + height, frame_height)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            region = frame[y0:y1, x0:x1]
+            mask = (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left))
+            region[...] = (region * inverse[mask] + ink[mask]) // 255
+
+    def _draw_text_tile(self, frame: np.ndarray, position: tuple, text: str, font):
+        """Draw white text with PIL on a tile covering just its bounding box"""
+        x, y = position
+        left, top, right, bottom = font.getbbox(text)
+        x0, y0 = max(x + left, 0), max(y + top, 0)
+        x1, y1 = min(x + right, frame.shape[1]), min(y + bottom, frame.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        tile = Image.fromarray(frame[y0:y1, x0:x1])
+        ImageDraw.Draw(tile).text((x - x0, y - y0), text, fill=(255, 255, 255), font=font)
+        frame[y0:y1, x0:x1] = np.asarray(tile)
 
-        # Calculate spacing based on fixed width
-        total_width = self.width - 100
-        spacing = total_width // num_items
-        y = self.height - 120
+    def _paste(self, frame: np.ndarray, image: Image, position: tuple):
+        """Copy an image into the frame at position, clipped to the frame (like Image.paste without a mask)"""
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        pixels = np.asarray(image)[..., :3]
 
-        for i, (pos, text, bg_color) in enumerate(items):
-            x = 50 + (i * spacing)
-            self._draw_text_with_background(
-                draw,
-                (x, y),
-                text,
-                font,
-                (255, 255, 255),
-                bg_color,
-                padding=20,
-                radius=15,
-                fixed_width=fixed_width
-            )
-
-    def _create_frame(self, point_data: Dict, current_time: float, activity_data: Dict) -> np.ndarray:
-        """Create a single frame with activity data overlay"""
-        # Create background
-        if self.show_map and self.map_position == 'background':
-            # Generate map as background
-            pil_image = self._generate_map(activity_data, point_data)
-            pil_image = pil_image.resize((self.width, self.height))
-        else:
-            # Create black background
-            frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-            pil_image = Image.fromarray(frame)
+        x, y = position
+        height, width = pixels.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, frame.shape[1]), min(y + height, frame.shape[0])
+        if x0 < x1 and y0 < y1:
+            frame[y0:y1, x0:x1] = pixels[y0 - y:y1 - y, x0 - x:x1 - x]
 
-        draw = ImageDraw.Draw(pil_image)
+    def _get_font(self):
+        """Overlay font, loaded once per generator"""
+        if self._font is not None:
+            return self._font
 
         # Load font with specified size
         font_size_px = self.font_sizes.get(self.font_size, 45)
 
         try:
             # Try Japanese fonts first
-            font_paths = [
-                "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
-                "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
-                "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
-                "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-            ]
-
             font = None
-            for font_path in font_paths:
+            for font_path in OVERLAY_FONT_PATHS:
                 try:
                     font = ImageFont.truetype(font_path, font_size_px)
                     break
@@ -512,50 +786,90 @@ class VideoGenerator:
         except:
             font = ImageFont.load_default()
 
+        self._font = font
+        return font
+
+    def _text_bbox(self, text: str, font) -> tuple:
+        """Bounding box of text drawn at (0, 0), measured once per string"""
+        bbox = self._text_bboxes.get(text)
+        if bbox is None:
+            bbox = font.getbbox(text)
+            if len(self._text_bboxes) >= 4096:
+                self._text_bboxes.clear()
+            self._text_bboxes[text] = bbox
+        return bbox
+
+    def _create_frame(self, frame_idx: int, tracks: FrameTracks, activity_data: Dict, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Create a single frame with activity data overlay
+
+        The frame is drawn into out (a reusable H x W x 3 uint8 buffer) when given.
+        """
+        font = self._get_font()
+
         # Calculate distance
-        total_distance = activity_data['total_distance'] / 1000  # Convert to km
-        elapsed_distance = 0
-        for point in activity_data['points']:
-            if point['elapsed_time'] <= current_time:
-                elapsed_distance += point.get('distance', 0)
-            else:
-                break
-        elapsed_distance = elapsed_distance / 1000  # Convert to km
+        elapsed_distance = float(tracks.elapsed_distance[frame_idx])
 
         # Get current values
-        speed = point_data.get('speed', 0)
-        elevation = point_data.get('elevation', 0)
-        heart_rate = point_data.get('heart_rate')
-
-        # Build item data
-        item_values = {
-            'speed': (f"速度: {speed:.1f} km/h", (60, 50, 30, 200)),
-            'distance': (f"距離: {elapsed_distance:.2f} km", (30, 50, 60, 200)),
-            'elevation': (f"標高: {elevation:.1f} m", (30, 60, 30, 200)) if elevation is not None else None,
-            'heart_rate': (f"心拍数: {heart_rate} bpm", (60, 30, 30, 200)) if heart_rate else None
-        }
+        speed = float(tracks.speed[frame_idx])
+        elevation = float(tracks.elevation[frame_idx])
+        heart_rate = float(tracks.heart_rate[frame_idx])
 
-        # Filter items to display based on configuration
+        # Format only the configured items, skipping missing values
         items_to_display = []
-        for pos in sorted(self.display_items.keys()):
-            item_name = self.display_items[pos]
-            if item_name in item_values and item_values[item_name] is not None:
-                items_to_display.append((pos, item_values[item_name][0], item_values[item_name][1]))
+        for pos, item_name in self._item_order:
+            if item_name == 'speed':
+                text = f"速度: {speed:.1f} km/h"
+            elif item_name == 'distance':
+                text = f"距離: {elapsed_distance:.2f} km"
+            elif item_name == 'elevation' and not np.isnan(elevation):
+                text = f"標高: {elevation:.1f} m"
+            elif item_name == 'heart_rate' and heart_rate and not np.isnan(heart_rate):
+                text = f"心拍数: {int(heart_rate)} bpm"
+            else:
+                continue
+            items_to_display.append((pos, text, ITEM_COLORS[item_name]))
 
-        # Display items based on layout
+        # Lay out items based on layout
+        panels, texts = [], []
         if self.layout == 'corners':
-            self._display_corners_layout(draw, items_to_display, font)
+            panels, texts = self._display_corners_layout(items_to_display, font)
         elif self.layout == 'bottom-right':
-            self._display_bottom_right_layout(draw, items_to_display, font)
+            panels, texts = self._display_bottom_right_layout(items_to_display, font)
         elif self.layout == 'top':
-            self._display_top_layout(draw, items_to_display, font)
+            panels, texts = self._display_top_layout(items_to_display, font)
         elif self.layout == 'bottom':
-            self._display_bottom_layout(draw, items_to_display, font)
+            panels, texts = self._display_bottom_layout(items_to_display, font)
+        panels = tuple(panels)
+
+        # Overlapping items are drawn one by one below; otherwise all panels go in the background
+        in_order = self._items_overlap(panels, texts, font)
+        background_panels = () if in_order else panels
+
+        # Create background with the (cached) panels
+        frame = out if out is not None else np.empty((self.height, self.width, 3), dtype=np.uint8)
+        if self.show_map and self.map_position == 'background':
+            # Generate map as background
+            map_image = self._generate_map(activity_data, tracks, frame_idx)
+            np.copyto(frame, np.asarray(map_image))
+            self._draw_panels(frame, background_panels)
+        else:
+            np.copyto(frame, self._panel_background(background_panels))
+
+        # Draw the text on top of the panels
+        draw_text = self._blit_text if isinstance(font, ImageFont.FreeTypeFont) else self._draw_text_tile
+        if in_order:
+            # Each panel covers the items before it, so the top item stays readable
+            for panel, (position, text) in zip(panels, texts):
+                self._draw_panels(frame, (panel,))
+                draw_text(frame, position, text, font)
+        else:
+            for position, text in texts:
+                draw_text(frame, position, text, font)
 
         # Add map if not background
         if self.show_map and self.map_position != 'background':
             map_width, map_height = 600, 400  # Small map size
-            map_image = self._generate_map(activity_data, point_data)
+            map_image = self._generate_map(activity_data, tracks, frame_idx)
             map_image = map_image.resize((map_width, map_height))
 
             # Calculate position based on map_position
@@ -568,7 +882,7 @@ class VideoGenerator:
             elif self.map_position == 'bottom-right':
                 map_x, map_y = self.width - map_width - 20, self.height - map_height - 20
 
-            pil_image.paste(map_image, (map_x, map_y))
+            self._paste(frame, map_image, (map_x, map_y))
 
         # Add elevation graph if enabled
         if self.show_elevation:
@@ -583,7 +897,7 @@ class VideoGenerator:
                 # Corner positions (40% width)
                 graph_width, graph_height = int(self.width * 0.4), 200
 
-            elevation_graph = self._generate_elevation_graph(activity_data, point_data, graph_width, graph_height)
+            elevation_graph = self._generate_elevation_graph(activity_data, tracks, frame_idx, graph_width, graph_height)
 
             # Calculate position
             if self.elevation_position == 'bottom':
@@ -597,9 +911,27 @@ class VideoGenerator:
             elif self.elevation_position == 'bottom-right':
                 graph_x, graph_y = self.width - graph_width - 20, self.height - graph_height - 20
 
-            pil_image.paste(elevation_graph, (graph_x, graph_y))
-
-        # Convert back to numpy array
-        frame = np.array(pil_image)
+            self._paste(frame, elevation_graph, (graph_x, graph_y))
 
         return frame
+
+
+def _init_render_worker(generator: VideoGenerator, tracks: FrameTracks, activity_data: Dict):
+    """Process pool initializer: keep the video being rendered for _render_range"""
+    _render_state['generator'] = generator
+    _render_state['tracks'] = tracks
+    _render_state['activity_data'] = activity_data
+
+
+def _render_range(frame_indices: List[int]) -> List[bytes]:
+    """Render a range of frames in a worker process"""
+    generator = _render_state['generator']
+    if 'buffer' not in _render_state:
+        # Each worker draws every frame into the same buffer
+        _render_state['buffer'] = np.empty((generator.height, generator.width, 3), dtype=np.uint8)
+
+    buffer = _render_state['buffer']
+    return [
+        generator._create_frame(frame_idx, _render_state['tracks'], _render_state['activity_data'], out=buffer).tobytes()
+        for frame_idx in frame_indices
+    ]
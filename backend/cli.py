@@ -4,19 +4,76 @@ CLI tool for converting activity files (GPX/TCX/FIT) to video
 """
 
 import argparse
+import functools
+import glob
+import hashlib
 import os
+import pickle
+import re
 import sys
+import time
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
-from app.parsers.gpx_parser import GPXParser
-from app.parsers.tcx_parser import TCXParser
-from app.parsers.fit_parser import FITParser
-from app.services.video_generator import VideoGenerator
+SUPPORTED_TYPES = ['.gpx', '.tcx', '.fit']
 
+# Bytes read from the start of a file to identify its type
+SNIFF_BYTES = 512
 
-def parse_args():
-    """Parse command line arguments"""
+# Root element of a GPX/TCX document (optionally namespace-prefixed)
+XML_ROOT_PATTERN = re.compile(rb'<(?:[\w.-]+:)?(gpx|TrainingCenterDatabase)\b')
+
+# Bump when the parsers' output changes so older cached results are ignored
+PARSE_CACHE_VERSION = 3
+
+# (condition, message) pairs checked on every parse result
+PARSE_WARNINGS = (
+    (lambda activity_data: activity_data['total_duration'] == 0,
+     "Warning: No time data found in file. Duration will be estimated based on distance."),
+    (lambda activity_data: not activity_data.get('has_time_data', False),
+     "Warning: File does not contain actual timestamp data. Time will be estimated."),
+)
+
+# Display items accepted by --items
+DISPLAY_ITEMS = ('speed', 'distance', 'elevation', 'heart_rate')
+
+# Minimum seconds between progress bar redraws on a terminal
+PROGRESS_INTERVAL = 0.1
+
+# Percent step between progress lines when stdout is not a terminal
+PROGRESS_PERCENT_STEP = 5
+
+# Progress bar width and every possible bar, indexed by filled length
+PROGRESS_BAR_LENGTH = 40
+PROGRESS_BARS = tuple('=' * i + '-' * (PROGRESS_BAR_LENGTH - i) for i in range(PROGRESS_BAR_LENGTH + 1))
+
+# Time and percent step of the last progress update
+_progress_state = {'time': 0.0, 'step': -1}
+
+# Video generator kept by each --batch worker across the files it converts
+_batch_state = {}
+
+
+def parse_items(value: str) -> Dict:
+    """Parse and validate --items ("1:speed,2:distance,...") into a position -> item mapping"""
+    items = {}
+    for item_def in value.split(','):
+        item_def = item_def.strip()
+        if not item_def:
+            continue
+        pos, sep, name = item_def.partition(':')
+        name = name.strip()
+        if not sep or not pos.strip().isdigit():
+            raise argparse.ArgumentTypeError(f"invalid item {item_def!r} (expected POSITION:ITEM, e.g. 1:speed)")
+        if name not in DISPLAY_ITEMS:
+            raise argparse.ArgumentTypeError(f"unknown item {name!r} (choose from {', '.join(DISPLAY_ITEMS)})")
+        items[int(pos)] = name
+    return items
+
+
+@functools.lru_cache(maxsize=1)
+def build_parser() -> argparse.ArgumentParser:
+    """Command line parser, built once per process"""
     parser = argparse.ArgumentParser(
         description='Convert activity files (GPX/TCX/FIT) to video',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -31,6 +88,9 @@ Examples:
   # Custom video settings
   python cli.py input.tcx -o output.mp4 --width 1280 --height 720 --fps 60
 
+  # Convert every FIT file in a directory, 2 files at a time
+  python cli.py --batch 'activities/*.fit' -o videos --jobs 2
+
   # Supported file formats: .gpx, .tcx, .fit
         """
     )
@@ -38,6 +98,7 @@ Examples:
     parser.add_argument(
         'input',
         type=str,
+        nargs='?',
         help='Input activity file (GPX/TCX/FIT)'
     )
 
@@ -45,7 +106,22 @@ Examples:
         '-o', '--output',
         type=str,
         default=None,
-        help='Output video file path (default: <input_filename>.mp4)'
+        help='Output video file path (default: <input_filename>.mp4); with --batch, the output directory'
+    )
+
+    parser.add_argument(
+        '--batch',
+        type=str,
+        metavar='PATTERN',
+        default=None,
+        help='Convert every file matching a glob pattern (e.g. "activities/*.gpx") instead of a single input'
+    )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='Number of files converted in parallel with --batch (default: 1)'
     )
 
     parser.add_argument(
@@ -69,6 +145,12 @@ Examples:
         help='Video frame rate (default: 30)'
     )
 
+    parser.add_argument(
+        '-f', '--force',
+        action='store_true',
+        help='Overwrite the output file without asking'
+    )
+
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
@@ -87,6 +169,24 @@ Examples:
         help='Require actual timestamp data in file (reject estimated time)'
     )
 
+    parser.add_argument(
+        '--trust-extension',
+        action='store_true',
+        help='Detect the file type from the extension only (skip reading the file header)'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the parsed activity cache'
+    )
+
+    parser.add_argument(
+        '--refresh-cache',
+        action='store_true',
+        help='Parse the file again and overwrite its cached result'
+    )
+
     parser.add_argument(
         '--layout',
         type=str,
@@ -105,7 +205,7 @@ Examples:
 
     parser.add_argument(
         '--items',
-        type=str,
+        type=parse_items,
         default=None,
         help='Display items in format "1:speed,2:distance,3:elevation,4:heart_rate" (位置番号:項目名)'
     )
@@ -138,50 +238,134 @@ Examples:
         help='Elevation graph position: bottom (下部全幅), top (上部全幅), bottom-left (左下), bottom-right (右下), bottom-center (下中央) (default: bottom)'
     )
 
-    return parser.parse_args()
+    return parser
 
 
-def detect_file_type(file_path: str) -> str:
-    """Detect file type from extension"""
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    return build_parser().parse_args(argv)
+
+
+def sniff_file_type(file_path: str):
+    """Detect file type from the first bytes of the file (None if not recognized)"""
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+
+    # FIT header: size byte (12 or 14), then ".FIT" at offset 8
+    if len(head) >= 12 and head[0] in (12, 14) and head[8:12] == b'.FIT':
+        return '.fit'
+
+    match = XML_ROOT_PATTERN.search(head)
+    if match:
+        return '.gpx' if match.group(1) == b'gpx' else '.tcx'
+    return None
+
+
+def detect_file_type(file_path: str, trust_extension: bool = False) -> str:
+    """Detect file type from the file header, falling back to the extension"""
+    if not trust_extension:
+        file_type = sniff_file_type(file_path)
+        if file_type:
+            return file_type
+
     ext = os.path.splitext(file_path)[1].lower()
-    if ext not in ['.gpx', '.tcx', '.fit']:
+    if ext not in SUPPORTED_TYPES:
         raise ValueError(f"Unsupported file type: {ext}. Supported types: .gpx, .tcx, .fit")
     return ext
 
 
-def parse_activity_file(file_path: str, file_type: str, verbose: bool = False):
-    """Parse activity file based on type"""
-    if verbose:
-        print(f"Parsing {file_type} file: {file_path}")
+def parse_cache_key(file_path: str, file_type: str, st: os.stat_result) -> str:
+    """Identify a parse result: absolute path, mtime, size, type and parser version"""
+    return f"{os.path.abspath(file_path)}|{st.st_mtime_ns}|{st.st_size}|{file_type}|{PARSE_CACHE_VERSION}"
+
 
+def parse_cache_path(key: str) -> str:
+    """Cache file for a parse result, under $XDG_CACHE_HOME/activetylog2mv"""
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, 'activetylog2mv', f"{digest}.pickle")
+
+
+def load_cached_activity(key: str):
+    """Return the cached parse result for key, or None"""
     try:
-        if file_type == '.gpx':
-            activity_data = GPXParser.parse(file_path)
-        elif file_type == '.tcx':
-            activity_data = TCXParser.parse(file_path)
-        elif file_type == '.fit':
-            activity_data = FITParser.parse(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
+        with open(parse_cache_path(key), 'rb') as f:
+            cached_key, activity_data = pickle.load(f)
+    except Exception:
+        return None
+    return activity_data if cached_key == key else None
+
+
+def save_cached_activity(key: str, activity_data: Dict):
+    """Store a parse result (best effort; the cache is only an optimization)"""
+    cache_path = parse_cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump((key, activity_data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+
+def print_parse_warnings(activity_data: Dict):
+    """Print the PARSE_WARNINGS that apply to a parse result"""
+    for condition, message in PARSE_WARNINGS:
+        if condition(activity_data):
+            print(message, file=sys.stderr)
+
+
+def parse_activity_file(file_path: str, file_type: str, verbose: bool = False, use_cache: bool = True,
+                        refresh_cache: bool = False, st: os.stat_result = None):
+    """Parse activity file based on type (reusing a cached result when the file is unchanged)
+
+    st is the file's os.stat() result when the caller already has it.
+    """
+    try:
+        cache_key = None
+        if use_cache:
+            cache_key = parse_cache_key(file_path, file_type, st or os.stat(file_path))
+        activity_data = None
+        if cache_key and not refresh_cache:
+            activity_data = load_cached_activity(cache_key)
+            if activity_data is not None and verbose:
+                print(f"Using cached parse result for {file_path}")
+
+        if activity_data is None:
+            if verbose:
+                print(f"Parsing {file_type} file: {file_path}")
+
+            # Parsers are imported on demand so --help and cached runs skip numba/fitdecode
+            if file_type == '.gpx':
+                from app.parsers.gpx_parser import GPXParser
+                activity_data = GPXParser.parse(file_path)
+            elif file_type == '.tcx':
+                from app.parsers.tcx_parser import TCXParser
+                activity_data = TCXParser.parse(file_path)
+            elif file_type == '.fit':
+                from app.parsers.fit_parser import FITParser
+                activity_data = FITParser.parse(file_path)
+            else:
+                raise ValueError(f"Unsupported file type: {file_type}")
+
+            if cache_key:
+                save_cached_activity(cache_key, activity_data)
 
         # Validate parsed data
-        if not activity_data['points']:
+        points = activity_data['points']
+        total_duration = activity_data['total_duration']
+        if not points:
             print(f"Error: No GPS points found in the file", file=sys.stderr)
             print(f"The file may be empty or contain only waypoints/routes without trackpoints", file=sys.stderr)
             sys.exit(1)
 
-        if activity_data['total_duration'] == 0:
-            print(f"Warning: No time data found in file. Duration will be estimated based on distance.", file=sys.stderr)
-
-        # Check if time data is required
-        if not activity_data.get('has_time_data', False):
-            if verbose or not activity_data.get('has_time_data', False):
-                print(f"Warning: File does not contain actual timestamp data. Time will be estimated.", file=sys.stderr)
+        print_parse_warnings(activity_data)
 
         if verbose:
             print(f"✓ Parsed successfully")
-            print(f"  Points: {len(activity_data['points'])}")
-            print(f"  Duration: {activity_data['total_duration']:.2f} seconds ({activity_data['total_duration']/60:.2f} minutes)")
+            print(f"  Points: {len(points)}")
+            print(f"  Duration: {total_duration:.2f} seconds ({total_duration/60:.2f} minutes)")
             print(f"  Distance: {activity_data['total_distance']/1000:.2f} km")
             print(f"  Max Speed: {activity_data['max_speed']:.2f} km/h")
             if activity_data['avg_speed'] > 0:
@@ -198,14 +382,28 @@ def parse_activity_file(file_path: str, file_type: str, verbose: bool = False):
 
 
 def print_progress(current: int, total: int, stage: str):
-    """Print progress bar"""
+    """Print progress bar (at most every PROGRESS_INTERVAL seconds, or every
+    PROGRESS_PERCENT_STEP percent when stdout is not a terminal)"""
     percent = (current / total) * 100 if total > 0 else 0
-    bar_length = 40
-    filled_length = int(bar_length * current // total) if total > 0 else 0
-    bar = '=' * filled_length + '-' * (bar_length - filled_length)
-    print(f'\r{stage} [{bar}] {percent:.1f}% ({current}/{total})', end='', flush=True)
-    if current >= total:
-        print()  # New line when complete
+    done = current >= total
+    if not done:
+        if sys.stdout.isatty():
+            now = time.monotonic()
+            if now - _progress_state['time'] < PROGRESS_INTERVAL:
+                return
+            _progress_state['time'] = now
+        else:
+            step = int(percent // PROGRESS_PERCENT_STEP)
+            if step <= _progress_state['step']:
+                return
+            _progress_state['step'] = step
+
+    filled_length = int(PROGRESS_BAR_LENGTH * current // total) if total > 0 else 0
+    bar = PROGRESS_BARS[min(filled_length, PROGRESS_BAR_LENGTH)]
+    sys.stdout.write(f'\r{stage} [{bar}] {percent:.1f}% ({current}/{total})')
+    if done:
+        sys.stdout.write('\n')  # New line when complete
+    sys.stdout.flush()
 
 
 def analyze_activity_data(activity_data: Dict, file_path: str):
@@ -214,16 +412,18 @@ def analyze_activity_data(activity_data: Dict, file_path: str):
     print(f"Activity File Analysis: {os.path.basename(file_path)}")
     print("=" * 70)
 
+    points = activity_data['points']
+    num_points = len(points)
+
     # Basic info
     print(f"\n📊 Basic Information:")
-    print(f"  Total Points: {len(activity_data['points'])}")
+    print(f"  Total Points: {num_points}")
     print(f"  Has Timestamp Data: {'Yes' if activity_data.get('has_time_data', False) else 'No (estimated)'}")
 
     # Time info
     duration = activity_data['total_duration']
-    hours = int(duration // 3600)
-    minutes = int((duration % 3600) // 60)
-    seconds = int(duration % 60)
+    hours, remainder = divmod(int(duration), 3600)
+    minutes, seconds = divmod(remainder, 60)
     print(f"\n⏱️  Time Information:")
     print(f"  Total Duration: {hours:02d}:{minutes:02d}:{seconds:02d} ({duration:.2f} seconds)")
 
@@ -245,46 +445,48 @@ def analyze_activity_data(activity_data: Dict, file_path: str):
         print(f"  Total Elevation Gain: {activity_data['total_elevation_gain']:.2f} m")
         print(f"  Total Elevation Loss: {activity_data['total_elevation_loss']:.2f} m")
 
-    # Check for additional data fields
-    first_point = activity_data['points'][0] if activity_data['points'] else {}
-    available_fields = []
-    if first_point.get('heart_rate'):
-        available_fields.append('Heart Rate')
-    if first_point.get('cadence'):
-        available_fields.append('Cadence')
-    if first_point.get('power'):
-        available_fields.append('Power')
+    # Check for additional data fields (present in any point)
+    available_fields = [
+        label for name, label in (('heart_rate', 'Heart Rate'), ('cadence', 'Cadence'), ('power', 'Power'))
+        if points.has_values(name)
+    ]
 
     if available_fields:
         print(f"\n📈 Additional Data Fields:")
         for field in available_fields:
             print(f"  - {field}")
 
-    # Sample data points
-    print(f"\n📍 Sample Data Points (first 5):")
-    for i, point in enumerate(activity_data['points'][:5]):
-        print(f"  Point {i+1}:")
-        print(f"    Time: {point.get('elapsed_time', 0):.2f}s")
+    # Sample data points (printed as one block)
+    lines = [f"\n📍 Sample Data Points (first 5):"]
+    for i in range(min(5, num_points)):
+        point = points.point(i)
+        lines.append(f"  Point {i+1}:")
+        lines.append(f"    Time: {point.get('elapsed_time', 0):.2f}s")
         lat = point.get('latitude')
         lon = point.get('longitude')
         if lat is not None and lon is not None:
-            print(f"    Location: {lat:.6f}, {lon:.6f}")
+            lines.append(f"    Location: {lat:.6f}, {lon:.6f}")
         else:
-            print(f"    Location: N/A (no GPS data)")
+            lines.append(f"    Location: N/A (no GPS data)")
         if point.get('elevation') is not None:
-            print(f"    Elevation: {point['elevation']:.2f}m")
+            lines.append(f"    Elevation: {point['elevation']:.2f}m")
         if point.get('speed'):
-            print(f"    Speed: {point['speed']:.2f} km/h")
+            lines.append(f"    Speed: {point['speed']:.2f} km/h")
         if point.get('heart_rate'):
-            print(f"    Heart Rate: {point['heart_rate']} bpm")
-
-    print("=" * 70)
+            lines.append(f"    Heart Rate: {point['heart_rate']} bpm")
+    lines.append("=" * 70)
+    print('\n'.join(lines))
 
 
 def generate_video(activity_data, output_path: str, width: int, height: int, fps: int, verbose: bool = False,
-                   layout: str = 'corners', font_size: str = 'medium', items: str = None, show_map: bool = False,
-                   show_elevation: bool = False, map_position: str = 'background', elevation_position: str = 'bottom'):
-    """Generate video from activity data"""
+                   layout: str = 'corners', font_size: str = 'medium', items: Dict = None, show_map: bool = False,
+                   show_elevation: bool = False, map_position: str = 'background', elevation_position: str = 'bottom',
+                   remove_on_failure: bool = False):
+    """Generate video from activity data
+
+    remove_on_failure deletes output_path when generation fails or is interrupted
+    (set when this run created the file).
+    """
     if verbose:
         print(f"\nGenerating video...")
         print(f"  Output: {output_path}")
@@ -293,7 +495,7 @@ def generate_video(activity_data, output_path: str, width: int, height: int, fps
         print(f"  Layout: {layout}")
         print(f"  Font size: {font_size}")
         if items:
-            print(f"  Items: {items}")
+            print(f"  Items: {','.join(f'{pos}:{name}' for pos, name in items.items())}")
         print(f"  Show map: {show_map}")
         if show_map:
             print(f"  Map position: {map_position}")
@@ -302,6 +504,9 @@ def generate_video(activity_data, output_path: str, width: int, height: int, fps
             print(f"  Elevation position: {elevation_position}")
 
     try:
+        # Imported here so --analyze doesn't load the rendering stack
+        from app.services.video_generator import VideoGenerator
+
         generator = VideoGenerator(width=width, height=height, fps=fps,
                                   layout=layout, font_size=font_size, items=items, show_map=show_map,
                                   show_elevation=show_elevation, map_position=map_position,
@@ -325,27 +530,193 @@ def generate_video(activity_data, output_path: str, width: int, height: int, fps
 
     except Exception as e:
         print(f"Error generating video: {e}", file=sys.stderr)
+        if remove_on_failure:
+            remove_output(output_path)
         sys.exit(1)
+    except KeyboardInterrupt:
+        if remove_on_failure:
+            remove_output(output_path)
+        raise
+
+
+def has_gps_data(points) -> bool:
+    """Whether any point has GPS coordinates (required for video generation)"""
+    # Imported here so --help and argument errors don't load NumPy
+    import numpy as np
+
+    latitude, longitude = points.latitude, points.longitude
+
+    # Most files have a position on the first or last point; only scan every point when neither does
+    for i in (0, -1):
+        if len(latitude) and not (np.isnan(latitude[i]) or np.isnan(longitude[i])):
+            return True
+    return bool(np.any(~np.isnan(latitude) & ~np.isnan(longitude)))
+
+
+def claim_output_path(output_path: str) -> bool:
+    """Create the output file atomically; False if it already exists"""
+    try:
+        os.close(os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+    except FileExistsError:
+        return False
+    return True
+
+
+def remove_output(output_path: str):
+    """Delete the output of a failed conversion (best effort)"""
+    try:
+        os.remove(output_path)
+    except OSError:
+        pass
+
+
+def _init_batch_worker(generator_options: Dict):
+    """Create the worker's VideoGenerator once; its fonts and glyph caches are reused for every file"""
+    from app.services.video_generator import VideoGenerator
+    _batch_state['generator'] = VideoGenerator(**generator_options)
+
+
+def convert_batch_file(input_path: str, output_path: str, overwrite: bool = False, verbose: bool = False,
+                       trust_extension: bool = False, use_cache: bool = True, refresh_cache: bool = False,
+                       require_time: bool = False) -> Optional[str]:
+    """Convert one --batch file with the worker's generator; returns an error message, or None on success"""
+    try:
+        file_type = detect_file_type(input_path, trust_extension)
+    except (ValueError, OSError) as e:
+        return str(e)
+
+    try:
+        activity_data = parse_activity_file(input_path, file_type, verbose,
+                                            use_cache=use_cache, refresh_cache=refresh_cache)
+    except SystemExit:
+        # The reason was already printed by parse_activity_file
+        return "Could not parse the file"
+
+    if require_time and not activity_data.get('has_time_data', False):
+        return "File does not contain actual timestamp data"
+    if not has_gps_data(activity_data['points']):
+        return "File does not contain GPS coordinates"
+    if not overwrite and not claim_output_path(output_path):
+        return f"Output file already exists: {output_path}"
+
+    # A file claimed above is removed again if the video can't be generated
+    try:
+        _batch_state['generator'].create_video(activity_data, output_path)
+    except Exception as e:
+        if not overwrite:
+            remove_output(output_path)
+        return f"Error generating video: {e}"
+    except KeyboardInterrupt:
+        if not overwrite:
+            remove_output(output_path)
+        raise
+    return None
+
+
+def print_batch_results(input_paths: list, output_paths: list, errors) -> int:
+    """Print one line per file as its conversion finishes; returns the number of failures"""
+    failed = 0
+    total = len(input_paths)
+    for i, (input_path, output_path, error) in enumerate(zip(input_paths, output_paths, errors), 1):
+        if error:
+            failed += 1
+            print(f"[{i}/{total}] {input_path}: Error: {error}", file=sys.stderr)
+        else:
+            print(f"[{i}/{total}] {input_path} -> {output_path}")
+    return failed
+
+
+def run_batch(args):
+    """Convert every file matching args.batch, args.jobs files at a time"""
+    input_paths = sorted(path for path in glob.glob(args.batch, recursive=True) if os.path.isfile(path))
+    if not input_paths:
+        print(f"Error: No files match: {args.batch}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output and not os.path.isdir(args.output):
+        print(f"Error: Output directory does not exist: {args.output}", file=sys.stderr)
+        sys.exit(1)
+
+    # Videos are named after their input file, next to it or in the output directory
+    output_paths = [
+        os.path.join(args.output or os.path.dirname(path), Path(path).stem + '.mp4')
+        for path in input_paths
+    ]
+
+    # Inputs sharing a name (ride.gpx and ride.fit, or a/x.gpx and b/x.gpx) would write the same video
+    inputs_by_output = {}
+    for input_path, output_path in zip(input_paths, output_paths):
+        inputs_by_output.setdefault(os.path.abspath(output_path), []).append(input_path)
+    collisions = {output: inputs for output, inputs in inputs_by_output.items() if len(inputs) > 1}
+    if collisions:
+        print("Error: Several input files would write the same output video:", file=sys.stderr)
+        for output_path, inputs in collisions.items():
+            print(f"  {output_path}: {', '.join(inputs)}", file=sys.stderr)
+        print("Narrow the --batch pattern or convert these files separately.", file=sys.stderr)
+        sys.exit(1)
+
+    generator_options = dict(width=args.width, height=args.height, fps=args.fps,
+                             layout=args.layout, font_size=args.font_size, items=args.items, show_map=args.show_map,
+                             show_elevation=args.show_elevation, map_position=args.map_position,
+                             elevation_position=args.elevation_position)
+    convert = functools.partial(convert_batch_file, overwrite=args.force, verbose=args.verbose,
+                                trust_extension=args.trust_extension, use_cache=not args.no_cache,
+                                refresh_cache=args.refresh_cache, require_time=args.require_time)
+
+    jobs = min(args.jobs, len(input_paths))
+    if jobs == 1:
+        # One file at a time, each video rendered on every CPU
+        _init_batch_worker(generator_options)
+        failed = print_batch_results(input_paths, output_paths, map(convert, input_paths, output_paths))
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Files are converted in parallel, so each worker renders its video in a single process
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_batch_worker,
+            initargs=({**generator_options, 'render_workers': 1},),
+        ) as executor:
+            failed = print_batch_results(input_paths, output_paths,
+                                         executor.map(convert, input_paths, output_paths))
+
+    print(f"\n{len(input_paths) - failed}/{len(input_paths)} videos generated")
+    sys.exit(1 if failed else 0)
 
 
 def main():
     """Main CLI entry point"""
     args = parse_args()
 
-    # Check if input file exists
-    if not os.path.exists(args.input):
+    if (args.input is None) == (args.batch is None):
+        build_parser().error("specify either an input file or --batch PATTERN")
+    if args.jobs < 1:
+        build_parser().error("--jobs must be at least 1")
+
+    if args.batch:
+        if args.analyze:
+            build_parser().error("--analyze cannot be used with --batch")
+        run_batch(args)
+
+    # Check if input file exists (the stat result is reused for the parse cache key)
+    try:
+        input_stat = os.stat(args.input)
+    except OSError:
         print(f"Error: Input file not found: {args.input}", file=sys.stderr)
         sys.exit(1)
 
     # Detect file type
     try:
-        file_type = detect_file_type(args.input)
-    except ValueError as e:
+        file_type = detect_file_type(args.input, args.trust_extension)
+    except (ValueError, OSError) as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
     # Determine output path (skip if in analyze mode)
     output_path = None
+    overwrite = args.force
     if not args.analyze:
         if args.output:
             output_path = args.output
@@ -361,11 +732,12 @@ def main():
             sys.exit(1)
 
         # Check if output file already exists
-        if os.path.exists(output_path):
+        if not overwrite and os.path.exists(output_path):
             response = input(f"Output file already exists: {output_path}. Overwrite? [y/N]: ")
             if response.lower() not in ['y', 'yes']:
                 print("Aborted.")
                 sys.exit(0)
+            overwrite = True
 
     if args.verbose:
         print("=" * 60)
@@ -373,7 +745,9 @@ def main():
         print("=" * 60)
 
     # Parse activity file
-    activity_data = parse_activity_file(args.input, file_type, args.verbose)
+    activity_data = parse_activity_file(args.input, file_type, args.verbose,
+                                        use_cache=not args.no_cache, refresh_cache=args.refresh_cache,
+                                        st=input_stat)
 
     # Check if --require-time flag is set
     if args.require_time and not activity_data.get('has_time_data', False):
@@ -388,21 +762,23 @@ def main():
         sys.exit(0)
 
     # Check if GPS coordinates exist (required for video generation)
-    has_gps_data = any(
-        point.get('latitude') is not None and point.get('longitude') is not None
-        for point in activity_data['points']
-    )
-    if not has_gps_data:
+    if not has_gps_data(activity_data['points']):
         print(f"Error: File does not contain GPS coordinates.", file=sys.stderr)
         print(f"This appears to be an indoor activity without location data.", file=sys.stderr)
         print(f"Video generation requires GPS coordinates to display the route and location.", file=sys.stderr)
         print(f"Tip: Use the --analyze (-a) flag to view the available data in this file.", file=sys.stderr)
         sys.exit(1)
 
+    # Create the output file atomically unless overwriting was allowed, so a file
+    # created by another run since the check above is never clobbered
+    if not overwrite and not claim_output_path(output_path):
+        print(f"Error: Output file was created by another process: {output_path}", file=sys.stderr)
+        sys.exit(1)
+
     # Generate video
     generate_video(activity_data, output_path, args.width, args.height, args.fps, args.verbose,
                   args.layout, args.font_size, args.items, args.show_map, args.show_elevation,
-                  args.map_position, args.elevation_position)
+                  args.map_position, args.elevation_position, remove_on_failure=not overwrite)
 
     if args.verbose:
         print("=" * 60)
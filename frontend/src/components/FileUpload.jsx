@@ -1,5 +1,5 @@
 import { useState } from 'react'
-import { uploadActivityFile, getVideoStatus, getVideoUrl } from '../lib/api'
+import { uploadActivityFile, getVideoStatus } from '../lib/api'
 import { supabase } from '../lib/supabase'
 
 export default function FileUpload() {
@@ -36,6 +36,16 @@ export default function FileUpload() {
     }
   }
 
+  const waitForVideo = async (id) => {
+    while (true) {
+      const status = await getVideoStatus(id)
+      if (status.status === 'completed' || status.status === 'failed') {
+        return status
+      }
+      await new Promise((resolve) => setTimeout(resolve, 2000))
+    }
+  }
+
   const handleUpload = async () => {
     if (!file) {
       setError('Please select a file')
@@ -58,13 +68,15 @@ export default function FileUpload() {
       const response = await uploadActivityFile(file)
       setVideoId(response.video_id)
 
-      // If video is completed immediately, set the URL
-      if (response.status === 'completed' && response.video_url) {
-        const url = getVideoUrl(response.video_id)
-        setVideoUrl(url)
-      }
-
       setFile(null)
+
+      // Video generation runs in the background; poll until it finishes
+      const status = await waitForVideo(response.video_id)
+      if (status.status === 'completed') {
+        setVideoUrl(status.video_url)
+      } else {
+        setError(status.error || 'Failed to generate video')
+      }
     } catch (err) {
       setError(err.response?.data?.detail || err.message || 'Failed to upload file')
     } finally {